@@ -0,0 +1,196 @@
+import argparse
+import json
+
+import numpy as np
+
+from business_calendar import WORK, BusinessCalendar
+from clerk import Clerk
+from client_classes import get_client_classes
+from randomizer import distr_ppf
+from simulation import MIN_PER_DAY, MODELING_END, MODELING_START, TIME_FACTORS, add_model_args, calc_time_coef, get_model_params
+
+# число узлов квадратуры для средних по распределениям
+N_NODES = 4096
+# нижняя граница среднего промежутка между клиентами (при нулевом промежутке клиенты приходят пачкой в одну минуту)
+MIN_PERIOD = 0.05
+
+
+def distr_mean(distr, range, transform=None):
+    """Среднее значение величины (или transform от нее) для распределения модели в границах range"""
+    values = distr_ppf(distr, range, (np.arange(N_NODES) + 0.5) / N_NODES)
+    if transform is not None:
+        values = transform(values)
+    return float(np.mean(values))
+
+
+def calc_mean_period(distr, query_range, time_coef):
+    """Средний промежуток между клиентами при коэффициенте времени time_coef (без учета загруженности банка)"""
+    return distr_mean(distr, query_range, lambda values: np.clip(np.rint((1 + time_coef) * values), query_range[0], query_range[1]))
+
+
+def get_time_coef_minutes(query_range, calendar, start=MODELING_START, end=MODELING_END, time_factors=TIME_FACTORS):
+    """Число рабочих минут периода [start, end) для каждого значения коэффициента времени"""
+    minutes = np.flatnonzero(calendar.get_states(start, end) == WORK) + start
+    dates, times = minutes // MIN_PER_DAY + 1, minutes % MIN_PER_DAY
+    coef_minutes = {}
+    for date, time in zip(dates.tolist(), times.tolist()):
+        coef = calc_time_coef(date, time, query_range, time_factors)
+        coef_minutes[coef] = coef_minutes.get(coef, 0) + 1
+    return coef_minutes
+
+
+def calc_arrival_rates(distr, query_range, time_coef, n_clerks, capacity):
+    """Интенсивности прихода клиентов (в минуту) при n = 0..capacity клиентах в банке
+       Промежуток растет с длиной очереди так же, как в модели (коэффициент загруженности без учета потерянных клиентов)"""
+    rates = []
+    for n in range(capacity + 1):
+        decrease_coef = max(n - n_clerks, 0) / 3 / (query_range[1] - query_range[0])
+        rates.append(1 / max(calc_mean_period(distr, query_range, time_coef + decrease_coef), MIN_PERIOD))
+    return np.array(rates)
+
+
+def calc_scv(distr, range, transform=None):
+    """Квадрат коэффициента вариации величины (дисперсия / квадрат среднего)"""
+    mean = distr_mean(distr, range, transform)
+    second = distr_mean(distr, range, lambda values: (values if transform is None else transform(values)) ** 2)
+    return (second - mean ** 2) / mean ** 2 if mean > 0 else 0.0
+
+
+def mmck(arrival_rates, service_rate, n_servers, variability=1.0, abandon_rates=None):
+    """Стационарные характеристики M/M/c/K с зависящим от состояния потоком: c клерков, arrival_rates[n] - интенсивность прихода
+       при n клиентах в банке, K = len(arrival_rates) - 1 - максимум клиентов в банке (в очереди и на обслуживании)
+       variability - поправка Аллена-Каннина (ca^2 + cs^2) / 2 к очереди и ожиданию для неэкспоненциальных распределений
+       abandon_rates[n] - суммарная интенсивность ухода ожидающих клиентов при n клиентах в банке (None - никто не уходит),
+       renege_rate - поток ушедших из очереди"""
+    arrival_rates = np.asarray(arrival_rates, dtype=float)
+    abandon_rates = np.zeros(len(arrival_rates)) if abandon_rates is None else np.asarray(abandon_rates, dtype=float)
+    n = np.arange(1, len(arrival_rates))
+    departure_rates = service_rate * np.minimum(n, n_servers) + abandon_rates[1:]
+    # логарифмы p_n / p_0, чтобы не переполняться при сотнях клерков
+    log_terms = np.concatenate(([0.0], np.cumsum(np.log(arrival_rates[:-1] / departure_rates))))
+    probs = np.exp(log_terms - log_terms.max())
+    probs /= probs.sum()
+    queue = np.maximum(np.arange(len(probs)) - n_servers, 0)
+    arrival_rate = float(arrival_rates @ probs)
+    effective_rate = float(arrival_rates[:-1] @ probs[:-1])
+    renege_rate = float(abandon_rates @ probs)
+    avg_q_len = float(queue @ probs) * variability
+    return {'arrival_rate': arrival_rate,
+            'service_rate': service_rate,
+            'loss_probability': 1 - effective_rate / arrival_rate,
+            'wait_probability': float(arrival_rates[n_servers:-1] @ probs[n_servers:-1]) / effective_rate,
+            'avg_q_len': avg_q_len,
+            'avg_waiting_time': avg_q_len / effective_rate,
+            'utilization': (effective_rate - renege_rate) / (n_servers * service_rate),
+            'effective_rate': effective_rate,
+            'renege_rate': renege_rate}
+
+
+def calc_mean_profit(distr, profit_range, client_classes=None):
+    """Средняя прибыль пришедшего клиента: при классах клиентов - смесь средних по долям классов
+       (класс без своего диапазона прибыли использует общий profit_range)"""
+    if client_classes is None:
+        return distr_mean(distr, profit_range)
+    client_classes = get_client_classes(client_classes)
+    total = sum(client_class.share for client_class in client_classes)
+    return sum(client_class.share * distr_mean(distr, profit_range if client_class.profit_range is None else client_class.profit_range)
+               for client_class in client_classes) / total
+
+
+def calc_patience_hazard(distr, patience_range):
+    """Доля ожидающих клиентов, уходящих за минуту, по минутам ожидания (последнее значение - для всех более долгих ожиданий)"""
+    horizon = int(patience_range[1]) + 2
+    patience = np.maximum(np.rint(distr_ppf(distr, patience_range, (np.arange(N_NODES) + 0.5) / N_NODES)), 1).astype(int)
+    # survival[t] - доля клиентов с терпением больше t минут
+    survival = 1 - np.cumsum(np.bincount(patience, minlength=horizon + 1))[:horizon + 1] / N_NODES
+    # уход на (t + 1)-й минуте ожидания среди дождавшихся t минут; если терпения больше t ни у кого нет - уходят все
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(survival[:-1] > 0, (survival[:-1] - survival[1:]) / survival[:-1], 1.0)
+
+
+def calc_abandon_rates(arrival_rates, n_clerks, hazard, variability=1.0):
+    """Суммарная интенсивность ухода из очереди при n клиентах в банке (приближение Уитта для M/M/c+GI):
+       j-й с конца клиент очереди ждет примерно сумму 1 / arrival_rates по состояниям, через которые прошла очередь после его прихода.
+       Ожидание масштабируется той же поправкой variability, что и очередь в mmck"""
+    abandon_rates = np.zeros(len(arrival_rates))
+    for n in range(n_clerks + 1, len(arrival_rates)):
+        waited = np.cumsum(1 / arrival_rates[n - 1:n_clerks - 1 if n_clerks else None:-1]) * variability
+        abandon_rates[n] = hazard[np.minimum(waited.astype(int), len(hazard) - 1)].sum()
+    return abandon_rates
+
+
+def get_control_means(distr, profit_range, serv_duration_range, client_classes=None):
+    """Точные средние управляющих переменных Simulation.get_control_variates()"""
+    return {'serv_duration': distr_mean(distr, serv_duration_range, np.rint),
+            'profit': calc_mean_profit(distr, profit_range, client_classes)}
+
+
+def estimate(n_clerks, max_q_len, distr, query_range, profit_range, serv_duration_range=(2, 30), calendar=None, time_factors=None,
+             client_classes=None, patience_range=None, arrivals=None, **params):
+    """Мгновенная оценка статистик месяца без моделирования
+       Для каждого значения коэффициента времени считается стационарный режим M/M/c/K с потоком, зависящим от длины очереди
+       (с поправкой на разброс промежутков и времени обслуживания), результаты взвешиваются по числу рабочих минут.
+       Рост промежутка с числом потерянных клиентов не учитывается, поэтому поток к концу месяца оценивается сверху.
+       Классы клиентов учитываются смесью прибыли по долям (без ухода из очереди приоритеты не меняют итогов по всем клиентам),
+       нетерпеливые клиенты - уходом из очереди с интенсивностью, зависящей от длины очереди (приближение M/M/c+GI).
+       Для приходов из трассы и для нетерпеливых классов с разным терпением или приоритетом оценка невозможна - ValueError
+       Остальные параметры модели (engine, assignment, ...) принимаются и не влияют на оценку"""
+    if arrivals is not None:
+        raise ValueError("Analytic estimate is unavailable for trace-driven arrivals")
+    if client_classes is not None:
+        client_classes = get_client_classes(client_classes)
+        patience_ranges = {patience_range if client_class.patience_range is None else client_class.patience_range for client_class in client_classes}
+        priorities = {client_class.priority for client_class in client_classes}
+        # ушедшие из очереди были бы клиентами определенных классов: с меньшим терпением или ждущими за приоритетными
+        if len(patience_ranges) > 1 or None not in patience_ranges and len(priorities) > 1:
+            raise ValueError("Analytic estimate is unavailable for client classes with different patience or priorities of impatient clients")
+        patience_range, = patience_ranges
+    calendar = BusinessCalendar() if calendar is None else calendar
+    control_means = get_control_means(distr, profit_range, serv_duration_range, client_classes)
+    hazard = None if patience_range is None else calc_patience_hazard(distr, patience_range)
+    variability = (calc_scv(distr, query_range, lambda values: np.clip(np.rint(values), query_range[0], query_range[1])) +
+                   calc_scv(distr, serv_duration_range, np.rint)) / 2
+    coef_minutes = get_time_coef_minutes(query_range, calendar, time_factors=TIME_FACTORS if time_factors is None else time_factors)
+    work_minutes = sum(coef_minutes.values())
+    admitted = reneged = lost = q_len_minutes = busy = wait_probability = 0
+    for coef, n_minutes in coef_minutes.items():
+        arrival_rates = calc_arrival_rates(distr, query_range, coef, n_clerks, n_clerks + max_q_len)
+        abandon_rates = None if hazard is None else calc_abandon_rates(arrival_rates, n_clerks, hazard, variability)
+        queue = mmck(arrival_rates, 1 / control_means['serv_duration'], n_clerks, variability, abandon_rates)
+        admitted += queue['effective_rate'] * n_minutes
+        reneged += queue['renege_rate'] * n_minutes
+        lost += (queue['arrival_rate'] - queue['effective_rate']) * n_minutes
+        q_len_minutes += queue['avg_q_len'] * n_minutes
+        busy += queue['utilization'] * n_minutes
+        wait_probability += queue['wait_probability'] * queue['effective_rate'] * n_minutes
+    closings = calendar.count_closings(MODELING_START, MODELING_END)
+    avg_q_len = q_len_minutes / work_minutes
+    # при закрытии клиенты из очереди уходят необслуженными
+    dropped = avg_q_len * closings
+    served = admitted - reneged
+    result = {'profit': round((served - dropped) * control_means['profit'] - Clerk(0).salary * n_clerks * closings),
+              'served_clients': round(served - dropped),
+              'lost_clients': round(lost + reneged + dropped),
+              'avg_waiting_time': round(q_len_minutes / admitted, 3),
+              'avg_clerk_busy_time': round(busy / work_minutes, 3),
+              'avg_q_len': round(avg_q_len, 3),
+              'loss_probability': round((lost + reneged) / (admitted + lost), 4),
+              'wait_probability': round(wait_probability / admitted, 4)}
+    if hazard is not None:
+        result['reneged_clients'] = round(reneged)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Аналитическая оценка статистик (M/M/c/K) без моделирования")
+    add_model_args(parser)
+    args = parser.parse_args(argv)
+    try:
+        result = estimate(**get_model_params(args))
+    except ValueError as error:
+        parser.error(str(error))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+import argparse
+import itertools
+import json
+import math
+
+import numpy as np
+
+from business_calendar import MIN_PER_DAY, BusinessCalendar
+from simulation import EVENING_START, add_model_args, get_engine, get_model_params
+
+MAGIC = b'BANKTRC1'
+# запись трассы: минута прихода от начала первого дня, длительность обслуживания (мин), прибыль
+TRACE_DTYPE = np.dtype([('minute', '<i8'), ('serve_time', '<f8'), ('profit', '<f8')])
+CSV_COLUMNS = ('arrival', 'serve_time', 'profit')
+CHUNK_SIZE = 1 << 16
+# сегменты потока для оценки поправок calc_time_coef: (каждый 5-й день, вечер)
+SEGMENTS = ((False, False), (True, False), (False, True), (True, True))
+
+
+class TraceReader():
+    """Чтение трассы приходов: двоичный файл (MAGIC + записи TRACE_DTYPE) отображается в память,
+       CSV с колонками arrival,serve_time,profit читается блоками
+       arrival в CSV - номер минуты от начала первого дня или дата и время (ISO 8601); во втором случае
+       минуты отсчитываются от полуночи дня первой записи"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            self.fmt = 'binary' if file.read(len(MAGIC)) == MAGIC else 'csv'
+        self.origin = None
+        if self.fmt == 'csv':
+            with open(path, encoding='utf-8') as file:
+                columns = file.readline().strip().split(',')
+                first = file.readline().strip().split(',')
+            if tuple(columns) != CSV_COLUMNS:
+                raise ValueError(f"Trace columns must be {','.join(CSV_COLUMNS)}, got {','.join(columns)}")
+            if first != [''] and not first[0].lstrip('-').isdigit():
+                self.origin = np.datetime64(first[0], 'D')
+
+    def get_records(self):
+        """Все записи двоичной трассы без чтения в память"""
+        return np.memmap(self.path, dtype=TRACE_DTYPE, mode='r', offset=len(MAGIC))
+
+    def iter_chunks(self, chunk_size=CHUNK_SIZE, start=0):
+        """Записи трассы блоками не больше chunk_size, начиная с записи номер start"""
+        if self.fmt == 'binary':
+            records = self.get_records()
+            for pos in range(start, len(records), chunk_size):
+                yield records[pos:pos + chunk_size]
+            return
+        with open(self.path, encoding='utf-8') as file:
+            for _ in itertools.islice(file, start + 1):
+                pass
+            while True:
+                lines = list(itertools.islice(file, chunk_size))
+                if not lines:
+                    return
+                yield self.parse_lines(lines)
+
+    def parse_lines(self, lines):
+        values = np.loadtxt(lines, dtype=str, delimiter=',', ndmin=2)
+        chunk = np.empty(len(values), dtype=TRACE_DTYPE)
+        if self.origin is None:
+            chunk['minute'] = values[:, 0].astype(np.int64)
+        else:
+            chunk['minute'] = (values[:, 0].astype('datetime64[m]') - self.origin).astype(np.int64)
+        chunk['serve_time'] = values[:, 1].astype(float)
+        chunk['profit'] = values[:, 2].astype(float)
+        return chunk
+
+
+def write_trace(path, chunks):
+    """Запись двоичной трассы из блоков записей (массивов TRACE_DTYPE), например TraceReader(csv).iter_chunks()"""
+    n_records = 0
+    with open(path, 'wb') as file:
+        file.write(MAGIC)
+        for chunk in chunks:
+            np.asarray(chunk, dtype=TRACE_DTYPE).tofile(file)
+            n_records += len(chunk)
+    return n_records
+
+
+class TraceArrivals():
+    """Источник приходов клиентов из трассы вместо генератора случайных чисел (Simulation(arrivals=...))
+       Трасса читается блоками по мере моделирования, поэтому ее размер не ограничен памятью.
+       Записи должны идти по возрастанию минуты; приходы в нерабочее время пропускаются (счетчик skipped).
+       offset сдвигает минуты трассы относительно модели. При сохранении (pickle) хранится только позиция в файле"""
+
+    def __init__(self, path, offset=0, chunk_size=CHUNK_SIZE):
+        self.path = path
+        self.offset = offset
+        self.chunk_size = chunk_size
+        self.position = 0
+        self.skipped = 0
+        self.open()
+
+    def __getstate__(self):
+        return {'path': self.path, 'offset': self.offset, 'chunk_size': self.chunk_size, 'position': self.position, 'skipped': self.skipped}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.open()
+
+    def open(self):
+        self.chunks = TraceReader(self.path).iter_chunks(self.chunk_size, self.position)
+        self.minutes = []
+        self.pos = 0
+        self.load()
+
+    def load(self):
+        """Следующий блок трассы (minutes = None, если трасса закончилась)"""
+        while self.pos == len(self.minutes):
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                self.minutes = None
+                return
+            self.minutes = (chunk['minute'] + self.offset).tolist()
+            self.serve_times = chunk['serve_time'].tolist()
+            self.profits = chunk['profit'].tolist()
+            self.pos = 0
+
+    def advance(self):
+        self.pos += 1
+        self.position += 1
+        if self.pos == len(self.minutes):
+            self.load()
+
+    def get_period(self, minute):
+        """Минут до ближайшего прихода не раньше minute (None, если трасса закончилась)"""
+        while self.minutes is not None and self.minutes[self.pos] < minute:
+            self.skipped += 1
+            self.advance()
+        return None if self.minutes is None else self.minutes[self.pos] - minute
+
+    def pop(self):
+        """Время обслуживания (целые минуты, не меньше 1) и прибыль клиента, приходящего сейчас"""
+        serve_time, profit = max(round(self.serve_times[self.pos]), 1), self.profits[self.pos]
+        self.advance()
+        return serve_time, profit
+
+
+class Moments():
+    """Число, сумма, сумма квадратов, минимум и максимум значений, накапливаемые по блокам"""
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, values):
+        if len(values):
+            self.count += len(values)
+            self.total += float(values.sum())
+            self.total_sq += float((values * values).sum())
+            self.min = min(self.min, float(values.min()))
+            self.max = max(self.max, float(values.max()))
+
+    def get_mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def get_std(self):
+        if self.count < 2:
+            return 0.0
+        return math.sqrt(max(self.total_sq - self.count * self.get_mean() ** 2, 0) / (self.count - 1))
+
+    def get_range(self, distr):
+        """Границы распределения модели с теми же средним и разбросом, в пределах наблюдавшихся значений
+           (равномерное: среднее +- sqrt(3) сигмы; нормальное модели: сигма - четверть ширины)"""
+        half_width = (math.sqrt(3) if distr == 'uniform' else 2) * self.get_std()
+        return (max(round(self.get_mean() - half_width), math.floor(self.min)), min(round(self.get_mean() + half_width), math.ceil(self.max)))
+
+
+def fit_trace(path, distr='uniform', calendar=None, chunk_size=CHUNK_SIZE):
+    """Оценка параметров модели по трассе за один проход по блокам:
+       query_range - по промежуткам между соседними приходами в обычные дни до вечера (без нерабочих минут между ними),
+       serv_duration_range и profit_range - по всем записям, time_factors - по средним промежуткам в сегментах
+       (5-й день, вечер) относительно обычного: средний промежуток ~ (1 + поправка / ширина query_range) * обычный"""
+    calendar = BusinessCalendar() if calendar is None else calendar
+    gaps = {segment: Moments() for segment in SEGMENTS}
+    serve_times, profits = Moments(), Moments()
+    last_minute = None
+    for chunk in TraceReader(path).iter_chunks(chunk_size):
+        if not len(chunk):
+            continue
+        minutes = chunk['minute'].astype(np.int64)
+        serve_times.add(chunk['serve_time'])
+        profits.add(chunk['profit'])
+        starts = minutes if last_minute is None else np.concatenate(([last_minute], minutes))
+        last_minute = int(minutes[-1])
+        calendar.ensure(last_minute + 1)
+        begin, end = starts[:-1], starts[1:]
+        # промежуток учитывается, если все минуты между приходами рабочие
+        whole = calendar.work_prefix[end] - calendar.work_prefix[begin] == end - begin
+        begin, period = begin[whole], (end - begin)[whole]
+        fifth_day = (begin // MIN_PER_DAY + 1) % 5 == 0
+        evening = begin % MIN_PER_DAY >= EVENING_START
+        for segment in SEGMENTS:
+            gaps[segment].add(period[(fifth_day == segment[0]) & (evening == segment[1])])
+
+    base = gaps[(False, False)]
+    query_range = base.get_range(distr)
+    width = max(query_range[1] - query_range[0], 1)
+    time_factors = {}
+    for name, segment in (('fifth_day', (True, False)), ('evening', (False, True))):
+        time_factors[name] = round((gaps[segment].get_mean() / base.get_mean() - 1) * width, 3) if gaps[segment].count and base.get_mean() else 0
+    return {'distr': distr,
+            'query_range': query_range,
+            'serv_duration_range': serve_times.get_range(distr),
+            'profit_range': profits.get_range(distr),
+            'time_factors': time_factors,
+            'n_arrivals': serve_times.count,
+            'n_periods': sum(moments.count for moments in gaps.values())}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Трассы реальных приходов: оценка параметров, преобразование, моделирование")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    fit_parser = subparsers.add_parser('fit', help="оценить query_range, serv_duration_range, profit_range и поправки потока")
+    fit_parser.add_argument('trace', help="файл трассы (двоичный или CSV)")
+    fit_parser.add_argument('--distr', choices=['uniform', 'normal'], default='uniform', help="распределение модели")
+
+    convert_parser = subparsers.add_parser('convert', help="преобразовать CSV-трассу в двоичную")
+    convert_parser.add_argument('trace', help="CSV-файл трассы")
+    convert_parser.add_argument('output', help="двоичный файл трассы")
+
+    run_parser = subparsers.add_parser('run', help="моделирование с приходами из трассы")
+    add_model_args(run_parser)
+    run_parser.add_argument('trace', help="файл трассы (двоичный или CSV)")
+    run_parser.add_argument('--offset', type=int, default=0, help="сдвиг минут трассы относительно модели")
+    args = parser.parse_args(argv)
+
+    if args.command == 'fit':
+        print(json.dumps(fit_trace(args.trace, args.distr), ensure_ascii=False, indent=2))
+    elif args.command == 'convert':
+        print(json.dumps({'records': write_trace(args.output, TraceReader(args.trace).iter_chunks())}))
+    else:
+        arrivals = TraceArrivals(args.trace, args.offset)
+        statistics = get_engine(args.engine)(**get_model_params(args), seed=args.seed, keep_clients=False, arrivals=arrivals).run()
+        statistics['skipped_arrivals'] = arrivals.skipped
+        print(json.dumps(statistics, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import heapq
+from collections import deque
+
+
+class InOrderPolicy():
+    """Клиент идет к свободному клерку с наименьшим номером (порядок исходной модели)
+       Свободные клерки хранятся в куче номеров, выбор и освобождение - O(log n)"""
+
+    def __init__(self):
+        self.free = []
+
+    def __len__(self):
+        return len(self.free)
+
+    def reset(self, clerks):
+        """Новый набор свободных клерков (при старте и изменении числа клерков)"""
+        self.free = [clerk.id for clerk in clerks]
+        heapq.heapify(self.free)
+
+    def release(self, clerk):
+        """Клерк освободился"""
+        heapq.heappush(self.free, clerk.id)
+
+    def acquire(self, client):
+        """Номер клерка для клиента; вызывается, только если свободные клерки есть"""
+        return heapq.heappop(self.free)
+
+    def get_serve_time(self, clerk_id, serve_time):
+        """Время обслуживания у выбранного клерка"""
+        return serve_time
+
+
+class LeastRecentlyUsedPolicy(InOrderPolicy):
+    """Клиент идет к клерку, который свободен дольше всех (равномерная загрузка окон)"""
+
+    def reset(self, clerks):
+        self.free = deque(clerk.id for clerk in clerks)
+
+    def release(self, clerk):
+        self.free.append(clerk.id)
+
+    def acquire(self, client):
+        return self.free.popleft()
+
+
+class SkillPolicy(InOrderPolicy):
+    """Маршрутизация по навыкам: клерк с навыком skills[i] обслуживает в skills[i] раз быстрее,
+       клиент идет к самому опытному из свободных клерков (при равных навыках - к клерку с меньшим номером)
+       Клерки без указанного навыка имеют навык 1"""
+
+    def __init__(self, skills):
+        super().__init__()
+        self.skills = list(skills)
+
+    def get_skill(self, clerk_id):
+        return self.skills[clerk_id] if clerk_id < len(self.skills) else 1
+
+    def reset(self, clerks):
+        self.free = [(-self.get_skill(clerk.id), clerk.id) for clerk in clerks]
+        heapq.heapify(self.free)
+
+    def release(self, clerk):
+        heapq.heappush(self.free, (-self.get_skill(clerk.id), clerk.id))
+
+    def acquire(self, client):
+        return heapq.heappop(self.free)[1]
+
+    def get_serve_time(self, clerk_id, serve_time):
+        return max(round(serve_time / self.get_skill(clerk_id)), 1)
+
+
+ASSIGNMENT_POLICIES = {'in_order': InOrderPolicy, 'lru': LeastRecentlyUsedPolicy}
+
+
+def get_policy(assignment='in_order'):
+    """Политика назначения клиентов клеркам по названию ('in_order', 'lru') или готовый объект политики"""
+    if not isinstance(assignment, str):
+        return assignment
+    if assignment not in ASSIGNMENT_POLICIES:
+        raise ValueError(f"Unknown assignment policy: {assignment}")
+    return ASSIGNMENT_POLICIES[assignment]()
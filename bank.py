@@ -1,10 +1,28 @@
+import heapq
+from assignment import get_policy
 from clerk import Clerk
+from client_queue import FifoQueue, PriorityQueue
 from collections import deque
+from streaming_stats import StatisticsAccumulators
 
 class Bank:
-    def __init__(self, n_clerks, max_q_len, system):
+    """Банк: очередь клиентов и клерки
+       Свободные клерки хранятся в политике назначения (assignment), занятые - в куче по минуте окончания обработки,
+       поэтому начало и окончание обработки стоят O(log n) вне зависимости от числа клерков
+       При priorities=True очередь - куча по приоритетам клиентов (PriorityQueue), иначе - по порядку прихода:
+       FifoQueue, если клиенты могут уйти из очереди (deadlines=True), или просто deque.
+       Сроки ухода нетерпеливых клиентов хранятся по минутам (минута -> клиенты) вместе с кучей минут,
+       а ушедшие удаляются из очереди лениво, поэтому истечение срока стоит O(1) на клиента, а очередь не просматривается"""
+    def __init__(self, n_clerks, max_q_len, system, assignment='in_order', priorities=False, deadlines=False):
         self.clerks = [Clerk(id) for id in range(n_clerks)]
-        self.client_queue = deque()
+        self.policy = get_policy(assignment)
+        self.policy.reset(self.clerks)
+        self.busy = []
+        self.n_busy = 0
+        self.mode = 'work'
+        self.client_queue = PriorityQueue() if priorities else FifoQueue() if deadlines else deque()
+        self.deadlines = {}
+        self.deadline_minutes = []
         self.max_q_len = max_q_len
         self.statistics = {'profit': 0, 
                            'served_clients': 0,
@@ -15,53 +33,130 @@ class Bank:
                            'max_q_len': 0,
                            'min_q_len': 0,
                            'avg_q_len': 0}
+        self.accumulators = StatisticsAccumulators(n_clerks)
         self.system = system
     
     def process_new_client(self, client):
         """Функция обработки нового клиента 
            Добавляем в очередь, либо клиент уходит при досотижении максимальной длины"""
-        if len(self.client_queue) == self.max_q_len:
+        if self.is_full():
             self.statistics['lost_clients'] += 1
             return client
         else:
             self.client_queue.append(client)
+            if client.deadline is not None:
+                self.add_deadline(client)
+
+    def add_deadline(self, client):
+        """Клиент уйдет из очереди в минуту client.deadline, если к этому времени не начнет обслуживаться"""
+        clients = self.deadlines.get(client.deadline)
+        if clients is None:
+            self.deadlines[client.deadline] = clients = []
+            heapq.heappush(self.deadline_minutes, client.deadline)
+            self.system.deadline_added(client.deadline)
+        clients.append(client)
+
+    def expire_deadlines(self, minute):
+        """Уход клиентов, срок ожидания которых истек к минуте minute (уже обслуживаемые и ушедшие пропускаются)"""
+        while self.deadline_minutes and self.deadline_minutes[0] <= minute:
+            for client in self.deadlines.pop(heapq.heappop(self.deadline_minutes)):
+                if client.status == 'waiting':
+                    self.renege(client)
+
+    def renege(self, client):
+        """Клиент не дождался обслуживания и ушел из очереди"""
+        client.status = 'reneged'
+        self.client_queue.remove(client)
+        client.wait_time = self.system.time - client.start_time
+        self.statistics['lost_clients'] += 1
+        self.statistics['reneged_clients'] += 1
+        self.accumulators.add_waiting_time(client.wait_time)
+        self.system.client_reneged(client)
+
+    def get_next_deadline(self):
+        """Ближайшая минута ухода нетерпеливых клиентов (None, если сроков нет)"""
+        return self.deadline_minutes[0] if self.deadline_minutes else None
 
     def make_step(self, on='work'):
         """Выполнение шага моделирования длиной в 1 минуту 
-           Вызываем соответствующий метод для clerk'ов
-           После этого отсматриваем есть ли свободные клерки, для них достаем из очереди клиентов и выполняем связывание
-           Сохраняем данные (к примеру, длину очереди на текущей минуте) в статистиках для дальнейшего подсчета после выполнения шага"""
-        new_serving_clients = []
+           Клерки, у которых в эту минуту заканчивается обработка, снимаются с кучи занятых и освобождаются
+           После этого в рабочее время свободным клеркам (по политике назначения) передаются клиенты из очереди,
+           а затем из очереди уходят клиенты, чье терпение истекло"""
         processed_clients = []
-        for clerk in self.clerks:
-            clerk.make_step(on)
-            if clerk.status in {'free', on}:
-                if clerk.client:
-                    # collect info from served client
-                    self.statistics['served_clients'] += 1
-                    self.statistics['profit'] += clerk.client.profit
-                    self.system.remove_tablo_line(clerk.client.id)
-                    processed_clients.append(clerk.client)
-                    clerk.client = None
-                if clerk.status=='free' and self.client_queue:
-                    new_client = self.client_queue.popleft()
-                    self.system.add_info_tablo(new_client.id, clerk.id + 1)
+        minute = self.system.get_minute()
+        if on != self.mode:
+            self.set_idle_status(on)
+        while self.busy and self.busy[0][0] <= minute:
+            clerk = self.clerks[heapq.heappop(self.busy)[1]]
+            clerk.finish_serve(on)
+            self.n_busy -= 1
+            # collect info from served client
+            self.statistics['served_clients'] += 1
+            self.statistics['profit'] += clerk.client.profit
+            self.system.serve_finished(clerk)
+            processed_clients.append(clerk.client)
+            clerk.client = None
+            self.policy.release(clerk)
+        if on == 'work':
+            while self.client_queue and len(self.policy):
+                clerk = self.clerks[self.policy.acquire(self.client_queue[0])]
+                new_client = self.client_queue.popleft()
+                if new_client.service_demand is None:
                     serv_duration_time = self.system.randomizer.gen_serv_duration(self.system.distr, self.system.serv_duration_range)
-                    new_client.start_serve(self.system.time, serv_duration_time)
-                    clerk.serve_client(new_client, serv_duration_time)
+                else:
+                    serv_duration_time = new_client.service_demand
+                self.accumulators.add_serv_duration(serv_duration_time)
+                serv_duration_time = self.policy.get_serve_time(clerk.id, serv_duration_time)
+                new_client.start_serve(self.system.time, serv_duration_time)
+                self.accumulators.add_waiting_time(new_client.wait_time)
+                clerk.serve_client(new_client, serv_duration_time)
+                heapq.heappush(self.busy, (minute + serv_duration_time, clerk.id))
+                self.n_busy += 1
+                self.system.serve_started(clerk)
+        if self.deadline_minutes and self.deadline_minutes[0] <= minute:
+            self.expire_deadlines(minute)
         return processed_clients
-    
+
+    def is_full(self):
+        """Очередь заполнена: новый клиент будет потерян (очередь может быть длиннее, если предел уменьшили во время моделирования)"""
+        return len(self.client_queue) >= self.max_q_len
+
+    def get_next_finish(self):
+        """Ближайшая минута окончания обработки (None, если все клерки свободны)"""
+        return self.busy[0][0] if self.busy else None
+
+    def set_idle_status(self, status):
+        """Смена режима: свободные клерки уходят на перерыв/домой или выходят на работу (O(n) только при смене режима)"""
+        self.mode = status
+        for clerk in self.clerks:
+            if clerk.client is None:
+                clerk.status = 'free' if status == 'work' else status
+
     def drop_q(self):
         lost_clients = []
         self.statistics['lost_clients'] += len(self.client_queue)
         for client in self.client_queue:
             client.wait_time = self.system.time - client.start_time  
             client.status = 'lost'
+            if client.wait_time:
+                self.accumulators.add_waiting_time(client.wait_time)
             lost_clients.append(client)
-        self.client_queue = deque()
+        self.client_queue.clear()
         return lost_clients
     
+    def set_n_clerks(self, n_clerks):
+        """Изменение числа клерков во время моделирования (убирать можно только клерков без клиента)"""
+        while len(self.clerks) > n_clerks:
+            if self.clerks[-1].client:
+                raise ValueError("Cannot remove a clerk who is serving a client")
+            self.clerks.pop()
+        while len(self.clerks) < n_clerks:
+            clerk = Clerk(len(self.clerks))
+            clerk.status = 'free' if self.mode == 'work' else self.mode
+            self.clerks.append(clerk)
+        self.policy.reset([clerk for clerk in self.clerks if clerk.client is None])
+        self.accumulators.n_clerks = n_clerks
+
     def start_work(self):
-        if self.clerks[0].status in {'home', 'break'}:
-            for clerk in self.clerks:
-                clerk.status = 'free'
\ No newline at end of file
+        if self.mode != 'work':
+            self.set_idle_status('work')
@@ -0,0 +1,178 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+from simulation import MODELING_END, MODELING_START, STEP_OPTIONS, get_engine
+
+BASE_PARAMS = {'n_clerks': 3, 'max_q_len': 10, 'distr': 'uniform', 'query_range': (0, 15), 'profit_range': (100, 10000), 'serv_duration_range': (2, 30)}
+# метрики, рост которых - регрессия (для остальных регрессия - падение)
+LOWER_IS_BETTER = {'wall_time', 'peak_rss_kb', 'traced_peak_kb', 'allocated_blocks', 'gc_collections'}
+# метрики для сравнения с эталоном
+COMPARED_METRICS = ('minutes_per_sec', 'arrivals_per_sec', 'peak_rss_kb', 'traced_peak_kb')
+# допустимое время холодного импорта модулей, с которых начинается процесс моделирования, мс
+IMPORT_BUDGET_MS = {'simulation': 300, 'event_simulation': 300, 'replication': 400, 'worker': 50}
+# модули, которые не должны загружаться при импорте (нужны только отдельным функциям и импортируются при первом вызове)
+LAZY_MODULES = ('scipy', 'tkinter', 'matplotlib')
+
+
+def make_scenarios(engines=('tick', 'event')):
+    """Набор сценариев с фиксированными зернами: шаги из STEP_OPTIONS, число клерков, распределения, легкая и полная очередь"""
+    variants = {}
+    for step in STEP_OPTIONS.values():
+        variants[f'step-{step}'] = ({}, step)
+    for n_clerks in (3, 30, 300):
+        variants[f'clerks-{n_clerks}'] = ({'n_clerks': n_clerks, 'query_range': (0, max(45 // n_clerks, 1)), 'max_q_len': 10 * n_clerks}, 30)
+    for distr in ('uniform', 'normal'):
+        variants[f'distr-{distr}'] = ({'distr': distr}, 30)
+    variants['load-light'] = ({'query_range': (20, 90)}, 30)
+    variants['load-saturated'] = ({'n_clerks': 2, 'query_range': (0, 3)}, 30)
+    scenarios = []
+    for engine in engines:
+        for name, (params, step) in variants.items():
+            scenarios.append({'name': f'{engine}/{name}', 'engine': engine, 'params': dict(BASE_PARAMS, **params), 'step': step, 'seed': 1})
+    return scenarios
+
+
+def run_scenario(scenario):
+    """Моделирование месяца шагами scenario['step'], как по кнопке 'сделать шаг' в интерфейсе"""
+    simulation = get_engine(scenario['engine'])(**scenario['params'], seed=scenario['seed'], keep_clients=False)
+    while simulation.steps_to_end() > 0:
+        simulation.make_step(min(scenario['step'], simulation.steps_to_end()))
+    return simulation
+
+
+def measure(scenario, repeat=5):
+    """Замеры сценария (выполняется в отдельном процессе, чтобы пиковая память относилась только к нему)
+       Время - лучшее из repeat прогонов; память и сборки мусора - по отдельному прогону под tracemalloc"""
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        blocks = sys.getallocatedblocks()
+        collections = sum(stat['collections'] for stat in gc.get_stats())
+        start = time.perf_counter()
+        simulation = run_scenario(scenario)
+        wall_time = time.perf_counter() - start
+        if best is None or wall_time < best['wall_time']:
+            best = {'wall_time': wall_time,
+                    'allocated_blocks': sys.getallocatedblocks() - blocks,
+                    'gc_collections': sum(stat['collections'] for stat in gc.get_stats()) - collections}
+        n_arrivals = simulation.curr_client_id
+        del simulation
+
+    tracemalloc.start()
+    run_scenario(scenario)
+    traced_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    best.update({'minutes_per_sec': (MODELING_END - MODELING_START) / best['wall_time'],
+                 'arrivals_per_sec': n_arrivals / best['wall_time'],
+                 'arrivals': n_arrivals,
+                 # ru_maxrss - в килобайтах в Linux и в байтах в macOS
+                 'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // (1024 if sys.platform == 'darwin' else 1),
+                 'traced_peak_kb': traced_peak // 1024})
+    return best
+
+
+def measure_import(module, repeat=5):
+    """Время холодного импорта модуля (лучшее из repeat запусков нового интерпретатора) и загруженные им тяжелые модули"""
+    code = (f"import sys, time; start = time.perf_counter(); import {module}; elapsed = time.perf_counter() - start; "
+            f"print(elapsed * 1000, *[name for name in {LAZY_MODULES!r} if name in sys.modules])")
+    best, heavy = None, []
+    for _ in range(repeat):
+        # новый интерпретатор запускается в каталоге модели, чтобы импорт не зависел от текущего каталога
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split()
+        if best is None or float(output[0]) < best:
+            best, heavy = float(output[0]), output[1:]
+    return {'import_ms': round(best, 1), 'heavy_modules': heavy}
+
+
+def check_imports(imports, budget=IMPORT_BUDGET_MS):
+    """Нарушения бюджета импорта: превышение времени или загрузка модулей из LAZY_MODULES"""
+    violations = []
+    for module, metrics in imports.items():
+        if metrics['import_ms'] > budget.get(module, float('inf')):
+            violations.append({'module': module, 'import_ms': metrics['import_ms'], 'budget_ms': budget[module]})
+        if metrics['heavy_modules']:
+            violations.append({'module': module, 'heavy_modules': metrics['heavy_modules']})
+    return violations
+
+
+def run_benchmarks(scenarios, repeat=5, callback=None):
+    """Замеры всех сценариев, каждый в новом процессе"""
+    results = {}
+    for scenario in scenarios:
+        with ProcessPoolExecutor(1, max_tasks_per_child=1) as executor:
+            results[scenario['name']] = executor.submit(measure, scenario, repeat).result()
+        if callback is not None:
+            callback(scenario['name'], results[scenario['name']])
+    imports = {module: measure_import(module, repeat) for module in IMPORT_BUDGET_MS}
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'repeat': repeat, 'results': results, 'imports': imports}
+
+
+def compare(report, baseline, tolerance=0.2):
+    """Регрессии относительно эталона: метрики, ухудшившиеся больше чем на долю tolerance"""
+    regressions = []
+    for name, metrics in report['results'].items():
+        if name not in baseline['results']:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = baseline['results'][name][metric], metrics[metric]
+            if not old:
+                continue
+            change = (new - old) / old
+            if (change > tolerance) if metric in LOWER_IS_BETTER else (change < -tolerance):
+                regressions.append({'scenario': name, 'metric': metric, 'baseline': old, 'current': new, 'change': round(change, 3)})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры скорости и памяти модели на фиксированных сценариях")
+    parser.add_argument('--engine', choices=['tick', 'event'], nargs='+', default=['tick', 'event'], help="движки")
+    parser.add_argument('--filter', default=None, help="только сценарии, в названии которых есть подстрока")
+    parser.add_argument('--repeat', type=int, default=5, help="число прогонов для замера времени (берется лучший)")
+    parser.add_argument('--output', default=None, help="файл для результатов (JSON)")
+    parser.add_argument('--baseline', default=None, help="файл эталонных результатов для поиска регрессий")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="допустимое ухудшение метрики (доля)")
+    parser.add_argument('--imports-only', action='store_true', help="только проверка времени импорта (IMPORT_BUDGET_MS)")
+    args = parser.parse_args(argv)
+
+    if args.imports_only:
+        imports = {module: measure_import(module, args.repeat) for module in IMPORT_BUDGET_MS}
+        violations = check_imports(imports)
+        print(json.dumps({'imports': imports, 'violations': violations}, ensure_ascii=False, indent=2))
+        if violations:
+            sys.exit(1)
+        return
+
+    scenarios = [scenario for scenario in make_scenarios(args.engine) if args.filter is None or args.filter in scenario['name']]
+    report = run_benchmarks(scenarios, args.repeat, lambda name, metrics: print(
+        f"{name:28} {metrics['minutes_per_sec']:12.0f} мин/с {metrics['arrivals_per_sec']:10.0f} клиентов/с "
+        f"{metrics['peak_rss_kb']:8d} КБ RSS {metrics['traced_peak_kb']:6d} КБ выделено", file=sys.stderr))
+    if args.output is not None:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    violations = check_imports(report['imports'])
+    if args.baseline is not None:
+        with open(args.baseline, encoding='utf-8') as file:
+            regressions = compare(report, json.load(file), args.tolerance)
+        print(json.dumps(regressions + violations, ensure_ascii=False, indent=2))
+        if regressions or violations:
+            sys.exit(1)
+    elif args.output is None:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    if violations:
+        print(json.dumps(violations, ensure_ascii=False, indent=2), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+import numpy as np
+
+WORK_HOURS = (10, 19)
+WORK_HOURS_FR = (10, 17)
+BREAK_HOURS = (12, 13)
+MIN_PER_HOUR = 60
+HOURS_PER_DAY = 24
+MIN_PER_DAY = HOURS_PER_DAY * MIN_PER_HOUR
+
+STATES = ('home', 'break', 'work')
+HOME, BREAK, WORK = range(len(STATES))
+# часы работы по дням недели (номер дня % 7), None - выходной
+DEFAULT_WEEK_HOURS = {1: WORK_HOURS, 2: WORK_HOURS, 3: WORK_HOURS, 4: WORK_HOURS, 5: WORK_HOURS_FR, 6: None, 0: None}
+
+
+def parse_config(config):
+    """Аргументы BusinessCalendar из словаря BusinessCalendar.get_config() (после JSON)"""
+    week_hours = {int(day): tuple(hours) if hours else None for day, hours in config['week_hours'].items()}
+    break_hours = tuple(config['break_hours']) if config['break_hours'] else None
+    return {'week_hours': week_hours, 'break_hours': break_hours, 'holidays': config['holidays']}
+
+
+class BusinessCalendar():
+    """Поминутный календарь работы банка, рассчитанный заранее на горизонт моделирования
+       Хранит состояние каждой минуты, префиксные суммы рабочих минут и минуту следующей смены состояния,
+       поэтому все запросы выполняются за O(1). Горизонт при необходимости удваивается.
+       Минуты считаются от начала первого дня, день d имеет номер недели d % 7"""
+
+    def __init__(self, n_days=31, week_hours=None, break_hours=BREAK_HOURS, holidays=()):
+        self.week_hours = dict(DEFAULT_WEEK_HOURS if week_hours is None else week_hours)
+        self.break_hours = break_hours
+        self.holidays = set(holidays)
+        self.build(n_days)
+
+    def get_config(self):
+        """Параметры календаря в виде, пригодном для JSON"""
+        return {'week_hours': {str(day): hours for day, hours in self.week_hours.items()},
+                'break_hours': self.break_hours,
+                'holidays': sorted(self.holidays)}
+
+    def __getstate__(self):
+        """При сохранении (pickle) хранятся только параметры, массивы пересчитываются при загрузке"""
+        return {'config': self.get_config(), 'n_days': self.n_days}
+
+    def __setstate__(self, state):
+        self.__init__(state['n_days'], **parse_config(state['config']))
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(**parse_config(config))
+
+    def build(self, n_days):
+        """Расчет массивов на n_days дней"""
+        self.n_days = n_days
+        states = np.full(n_days * MIN_PER_DAY, HOME, dtype=np.int8)
+        for date in range(1, n_days + 1):
+            hours = self.week_hours.get(date % 7)
+            if hours is None or date in self.holidays:
+                continue
+            day_start = (date - 1) * MIN_PER_DAY
+            states[day_start + hours[0] * MIN_PER_HOUR:day_start + hours[1] * MIN_PER_HOUR] = WORK
+            if self.break_hours:
+                break_start = max(self.break_hours[0], hours[0])
+                break_end = min(self.break_hours[1], hours[1])
+                if break_start < break_end:
+                    states[day_start + break_start * MIN_PER_HOUR:day_start + break_end * MIN_PER_HOUR] = BREAK
+        self.states = states
+        self.work_prefix = np.concatenate(([0], np.cumsum(states == WORK)))
+        changes = np.flatnonzero(states[1:] != states[:-1]) + 1
+        # последняя смена за горизонтом - конец горизонта, дальше календарь будет достроен
+        changes = np.append(changes, len(states))
+        self.next_change = changes[np.searchsorted(changes, np.arange(len(states)), side='right')]
+        self.closing = np.zeros(len(states), dtype=bool)
+        self.closing[1:] = (states[1:] == HOME) & (states[:-1] != HOME)
+        # списки для быстрого доступа к отдельным элементам из Python
+        self.state_list = states.tolist()
+        self.next_change_list = self.next_change.tolist()
+        self.closing_list = self.closing.tolist()
+
+    def ensure(self, minute):
+        """Достраивание календаря, если minute выходит за горизонт"""
+        if minute >= len(self.state_list):
+            n_days = self.n_days
+            while minute >= n_days * MIN_PER_DAY:
+                n_days *= 2
+            self.build(n_days)
+
+    def get_state(self, minute):
+        """Состояние банка в минуту minute: 'work', 'break' или 'home' (закрыто)"""
+        self.ensure(minute)
+        return STATES[self.state_list[minute]]
+
+    def is_closing_time(self, minute):
+        """Минута minute - момент закрытия банка после рабочего дня"""
+        self.ensure(minute)
+        return self.closing_list[minute]
+
+    def next_state_change(self, minute):
+        """Первая минута после minute, в которую меняется состояние банка"""
+        self.ensure(minute + 1)
+        change = self.next_change_list[minute]
+        # смена за горизонтом: достраиваем, пока горизонт не покроет неделю после minute и все праздники
+        while change == len(self.state_list) and change <= max(minute + 7 * MIN_PER_DAY, max(self.holidays, default=0) * MIN_PER_DAY):
+            self.ensure(change)
+            change = self.next_change_list[minute]
+        return change
+
+    def work_minutes(self, start, end):
+        """Число рабочих минут в промежутке [start, end)"""
+        self.ensure(end)
+        return int(self.work_prefix[end] - self.work_prefix[start])
+
+    def get_states(self, start, end):
+        """Массив состояний минут промежутка [start, end)"""
+        self.ensure(end)
+        return self.states[start:end]
+
+    def count_closings(self, start, end):
+        """Число закрытий (выплат зарплаты) в промежутке [start, end)"""
+        self.ensure(end)
+        return int(self.closing[start:end].sum())
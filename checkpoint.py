@@ -0,0 +1,76 @@
+import argparse
+import json
+import pickle
+
+from randomizer import Randomizer
+from simulation import MIN_PER_DAY, MODELING_START, add_model_args, get_engine, get_model_params
+
+
+class Checkpoint():
+    """Снимок полного состояния модели: время и дата, очередь, клерки, накопленные статистики и состояние генератора
+       Снимок хранится в виде байтов pickle, поэтому каждое продолжение (fork) - дешевая независимая копия.
+       Загружать можно только собственные снимки: pickle исполняет код при чтении"""
+
+    def __init__(self, data):
+        self.data = data
+
+    @classmethod
+    def take(cls, simulation):
+        return cls(pickle.dumps(simulation, protocol=pickle.HIGHEST_PROTOCOL))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as file:
+            return cls(file.read())
+
+    def save(self, path):
+        with open(path, 'wb') as file:
+            file.write(self.data)
+
+    def restore(self):
+        """Модель в состоянии на момент снимка"""
+        return pickle.loads(self.data)
+
+    def fork(self, seed=None, **params):
+        """Продолжение со снимка с измененными параметрами (n_clerks, max_q_len, ...)
+           Без seed продолжения используют то же состояние генератора, то есть общие случайные числа"""
+        simulation = self.restore()
+        if seed is not None:
+            simulation.randomizer = Randomizer(seed, antithetic=simulation.randomizer.antithetic)
+        simulation.update_params(**params)
+        return simulation
+
+
+def run_until_day(simulation, day):
+    """Моделирование до 10:00 указанного дня"""
+    simulation.make_step(max((day - 1) * MIN_PER_DAY + MODELING_START - simulation.get_minute(), 0))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Снимки состояния модели и продолжения \"что если\"")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    save_parser = subparsers.add_parser('save', help="смоделировать до указанного дня и сохранить снимок")
+    add_model_args(save_parser)
+    save_parser.add_argument('--day', type=int, required=True, help="день снимка (в 10:00)")
+    save_parser.add_argument('output', help="файл снимка")
+
+    resume_parser = subparsers.add_parser('resume', help="продолжить моделирование со снимка до конца периода")
+    resume_parser.add_argument('checkpoint', help="файл снимка")
+    resume_parser.add_argument('--clerks', type=int, default=None, help="новое число клерков")
+    resume_parser.add_argument('--max-q-len', type=int, default=None, help="новая максимальная длина очереди")
+    resume_parser.add_argument('--seed', type=int, default=None, help="новое зерно (по умолчанию - продолжение того же потока)")
+    args = parser.parse_args(argv)
+
+    if args.command == 'save':
+        simulation = get_engine(args.engine)(**get_model_params(args), seed=args.seed)
+        run_until_day(simulation, args.day)
+        Checkpoint.take(simulation).save(args.output)
+        print(json.dumps(simulation.get_statistics(), ensure_ascii=False, indent=2))
+    else:
+        simulation = Checkpoint.load(args.checkpoint).fork(args.seed, n_clerks=args.clerks, max_q_len=args.max_q_len)
+        print(json.dumps(simulation.run(), ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -12,12 +12,7 @@ class Clerk():
         self.serve_time = time
         self.status = 'busy'
 
-    def make_step(self, on='work'):
-        """Шаг обработки в 1 минуту"""
-        if self.status == 'busy':
-            self.serve_time -= 1 
-            if self.serve_time == 0:
-                self.status = 'free' if on == 'work' else on
-                self.client.status = 'finish'
-        elif self.status == 'free' and on != 'work':
-            self.status = on
\ No newline at end of file
+    def finish_serve(self, on='work'):
+        """Окончание обработки текущего клиента"""
+        self.status = 'free' if on == 'work' else on
+        self.client.status = 'finish'
@@ -1,4 +1,6 @@
 class Client:
+    __slots__ = ('id', 'status', 'start_time', 'wait_time', 'serve_time', 'profit', 'priority', 'client_class', 'deadline', 'service_demand')
+
     def __init__(self, id, start_time, profit):
         self.id = id
         self.status = 'waiting'
@@ -6,6 +8,10 @@ class Client:
         self.wait_time = None
         self.serve_time = None
         self.profit = profit
+        self.priority = 0
+        self.client_class = None
+        self.deadline = None # minute from system start when the client leaves the queue unless served
+        self.service_demand = None # service duration known in advance (trace-driven arrivals), None - drawn at serve start
 
     def start_serve(self, curr_time, serve_time):
         """Начало обслуживания"""
@@ -0,0 +1,68 @@
+from itertools import accumulate
+
+
+class ClientClass():
+    """Класс клиентов: доля в потоке, диапазон прибыли (None - общий диапазон модели), приоритет в очереди
+       (больше - раньше обслуживается) и диапазон терпения в минутах (None - ждет до закрытия)"""
+
+    def __init__(self, name, share=1, profit_range=None, priority=0, patience_range=None):
+        self.name = name
+        self.share = share
+        self.profit_range = None if profit_range is None else tuple(profit_range)
+        self.priority = priority
+        self.patience_range = None if patience_range is None else tuple(patience_range)
+
+    def get_config(self):
+        return {'name': self.name, 'share': self.share, 'profit_range': self.profit_range,
+                'priority': self.priority, 'patience_range': self.patience_range}
+
+
+def get_client_classes(client_classes):
+    """Список классов клиентов из объектов ClientClass или словарей с теми же полями"""
+    return [client_class if isinstance(client_class, ClientClass) else ClientClass(**client_class) for client_class in client_classes]
+
+
+def get_cumulative_shares(client_classes):
+    """Накопленные доли классов, нормированные к 1 (для выбора класса по равномерному числу)"""
+    total = sum(client_class.share for client_class in client_classes)
+    return [value / total for value in accumulate(client_class.share for client_class in client_classes)]
+
+
+class ClassStatistics():
+    """Счетчики по классам клиентов: пришедшие, обслуженные, потерянные (в том числе не дождавшиеся), прибыль и ожидание"""
+
+    def __init__(self, client_classes):
+        self.statistics = {}
+        for client_class in client_classes:
+            self.add_class(client_class.name)
+
+    def add_class(self, name):
+        """Счетчики класса (например, класса клиентов, перенаправленных из отделения с другими классами)"""
+        self.statistics[name] = {'arrived': 0, 'served_clients': 0, 'lost_clients': 0, 'reneged_clients': 0,
+                                 'profit': 0, 'waiting_time': 0, 'n_waited': 0}
+
+    def add(self, kind, client):
+        """Учет перехода клиента: 'arrival', 'serve_start', 'finish' или 'lost' (клиенты без класса не учитываются)"""
+        if client.client_class is None:
+            return
+        statistics = self.statistics[client.client_class]
+        if kind == 'arrival':
+            statistics['arrived'] += 1
+        elif kind == 'finish':
+            statistics['served_clients'] += 1
+            statistics['profit'] += client.profit
+        elif kind == 'lost':
+            statistics['lost_clients'] += 1
+            if client.status == 'reneged':
+                statistics['reneged_clients'] += 1
+        if kind == 'serve_start' or (kind == 'lost' and client.wait_time):
+            statistics['waiting_time'] += client.wait_time
+            statistics['n_waited'] += 1
+
+    def get_statistics(self):
+        report = {}
+        for name, statistics in self.statistics.items():
+            report[name] = {key: value for key, value in statistics.items() if key not in {'waiting_time', 'n_waited'}}
+            report[name]['profit'] = round(statistics['profit'])
+            report[name]['avg_waiting_time'] = round(statistics['waiting_time'] / statistics['n_waited'], 3) if statistics['n_waited'] else 0
+        return report
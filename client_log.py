@@ -0,0 +1,52 @@
+from array import array
+
+import numpy as np
+
+STATUSES = ('waiting', 'serving', 'finish', 'lost', 'reneged')
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+# колонки журнала и типы массивов: q - целое 64 бит, d - вещественное, b - байт
+COLUMNS = (('id', 'q'), ('start_time', 'q'), ('wait_time', 'q'), ('serve_time', 'q'), ('profit', 'd'), ('status', 'b'))
+
+
+class ClientLog():
+    """Компактный журнал клиентов: по типизированному расширяемому массиву на колонку вместо списка объектов Client
+       Отсутствующие значения (например, время обслуживания у потерянного клиента) хранятся как -1.
+       При keep_records=False хранятся только счетчики"""
+
+    def __init__(self, keep_records=True):
+        self.keep_records = keep_records
+        self.count = 0
+        self.profit_sum = 0
+        self.columns = {name: array(typecode) for name, typecode in COLUMNS} if keep_records else None
+
+    def __len__(self):
+        return self.count
+
+    def append(self, client):
+        self.count += 1
+        self.profit_sum += client.profit
+        if not self.keep_records:
+            return
+        self.columns['id'].append(client.id)
+        self.columns['start_time'].append(client.start_time)
+        self.columns['wait_time'].append(-1 if client.wait_time is None else client.wait_time)
+        self.columns['serve_time'].append(-1 if client.serve_time is None else client.serve_time)
+        self.columns['profit'].append(client.profit)
+        self.columns['status'].append(STATUS_CODES[client.status])
+
+    def extend(self, clients):
+        for client in clients:
+            self.append(client)
+
+    def get_column(self, name):
+        """Колонка журнала как массив numpy (копия, чтобы журнал можно было дальше пополнять)"""
+        if not self.keep_records:
+            raise ValueError("Client records are not kept, only counters")
+        return np.frombuffer(self.columns[name].tobytes(), dtype=self.columns[name].typecode)
+
+    def mean(self, name, skip_missing=True):
+        """Среднее по колонке (по умолчанию без пропущенных значений -1)"""
+        values = self.get_column(name)
+        if skip_missing:
+            values = values[values >= 0]
+        return float(values.mean()) if len(values) else 0.0
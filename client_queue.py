@@ -0,0 +1,92 @@
+import heapq
+from collections import deque
+
+
+class PriorityQueue():
+    """Очередь клиентов с приоритетами (куча): раньше обслуживается клиент с большим client.priority,
+       при равных приоритетах - пришедший раньше. Интерфейс - как у deque, которой банк пользуется без приоритетов
+       Ушедший из очереди клиент (status != 'waiting') остается в куче и выбрасывается, когда оказывается первым,
+       поэтому уход из середины очереди стоит O(1)"""
+
+    def __init__(self):
+        self.heap = []
+        self.size = 0
+        self.n_pushed = 0
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return (client for _, _, client in self.heap if client.status == 'waiting')
+
+    def __getitem__(self, idx):
+        """Первый в очереди клиент (поддерживается только индекс 0)"""
+        if idx != 0:
+            raise IndexError("Only the head of the queue is accessible")
+        self.skip_removed()
+        return self.heap[0][2]
+
+    def append(self, client):
+        heapq.heappush(self.heap, (-client.priority, self.n_pushed, client))
+        self.n_pushed += 1
+        self.size += 1
+
+    def popleft(self):
+        self.skip_removed()
+        self.size -= 1
+        return heapq.heappop(self.heap)[2]
+
+    def remove(self, client):
+        """Учет ухода клиента из очереди (клиент уже помечен как ушедший)"""
+        self.size -= 1
+
+    def skip_removed(self):
+        while self.heap[0][2].status != 'waiting':
+            heapq.heappop(self.heap)
+
+    def clear(self):
+        self.heap = []
+        self.size = 0
+
+
+class FifoQueue():
+    """Очередь клиентов по порядку прихода с уходом из середины за O(1) (для нетерпеливых клиентов без приоритетов)
+       Как и в PriorityQueue, ушедший клиент остается в deque и выбрасывается, когда оказывается первым"""
+
+    def __init__(self):
+        self.clients = deque()
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return (client for client in self.clients if client.status == 'waiting')
+
+    def __getitem__(self, idx):
+        """Первый в очереди клиент (поддерживается только индекс 0)"""
+        if idx != 0:
+            raise IndexError("Only the head of the queue is accessible")
+        self.skip_removed()
+        return self.clients[0]
+
+    def append(self, client):
+        self.clients.append(client)
+        self.size += 1
+
+    def popleft(self):
+        self.skip_removed()
+        self.size -= 1
+        return self.clients.popleft()
+
+    def remove(self, client):
+        """Учет ухода клиента из очереди (клиент уже помечен как ушедший)"""
+        self.size -= 1
+
+    def skip_removed(self):
+        while self.clients[0].status != 'waiting':
+            self.clients.popleft()
+
+    def clear(self):
+        self.clients.clear()
+        self.size = 0
@@ -0,0 +1,167 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from checkpoint import Checkpoint
+from event_log import EventLogReader, EventLogWriter
+from network import NetworkSimulation, make_branches
+from replication import ReplicationRunner
+from simulation import MIN_PER_DAY, STEP_OPTIONS, get_engine
+from streaming_stats import RunningStat
+from vector_simulation import check_against_object_engine
+
+BASE_PARAMS = {'n_clerks': 3, 'max_q_len': 10, 'distr': 'uniform', 'query_range': (0, 15), 'profit_range': (100, 10000), 'serv_duration_range': (2, 30)}
+# сценарии: изменения BASE_PARAMS
+SCENARIOS = {
+    'default': {},
+    'normal': {'distr': 'normal'},
+    'lru': {'assignment': 'lru'},
+    'overload': {'query_range': (0, 4), 'max_q_len': 5},
+    'patience': {'query_range': (0, 4), 'max_q_len': 30, 'patience_range': (5, 20)},
+    'classes': {'query_range': (0, 4), 'max_q_len': 30,
+                'client_classes': [{'name': 'vip', 'share': 1, 'priority': 1, 'profit_range': (1000, 20000), 'patience_range': (10, 30)},
+                                   {'name': 'regular', 'share': 3, 'patience_range': (5, 20)}]},
+}
+# отделения сети (изменения параметров сценария): разное терпение и классы, чтобы перенаправленные клиенты их меняли
+NETWORK_CONFIG = [{'patience_range': (2, 6)}, {}, SCENARIOS['classes']]
+FORK_PARAMS = ({'n_clerks': 5}, {'n_clerks': 2}, {'max_q_len': 3}, {'query_range': (0, 3)})
+# предел |z| для сравнения средних векторного и объектного движков
+Z_LIMIT = 4
+
+
+def get_statistics(simulation):
+    statistics = simulation.get_statistics()
+    if simulation.get_class_statistics() is not None:
+        statistics['classes'] = simulation.get_class_statistics()
+    return statistics
+
+
+def run_by_steps(engine, params, seed, step):
+    """Прогон до конца периода шагами по step минут"""
+    simulation = get_engine(engine)(**params, seed=seed, keep_clients=False)
+    while simulation.steps_to_end() > 0:
+        simulation.make_step(min(step, simulation.steps_to_end()))
+    return get_statistics(simulation)
+
+
+def check_engines(params, seed):
+    """Поминутный и событийный движки при любой длине шага дают те же статистики, что и прогон за один шаг"""
+    failures = []
+    expected = run_by_steps('tick', params, seed, MIN_PER_DAY * 31)
+    for engine in ('tick', 'event'):
+        for step in STEP_OPTIONS.values():
+            statistics = run_by_steps(engine, params, seed, step)
+            if statistics != expected:
+                failures.append({'check': 'engines', 'engine': engine, 'step': step, 'expected': expected, 'got': statistics})
+    return failures
+
+
+def check_replay(params, seed):
+    """Статистики, восстановленные по журналу событий, совпадают со статистиками прогона"""
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        for fmt in ('binary', 'csv'):
+            path = os.path.join(directory, 'events.' + fmt)
+            simulation = get_engine('event')(**params, seed=seed, keep_clients=False)
+            writer = EventLogWriter(path, simulation, fmt)
+            statistics = simulation.run()
+            writer.close()
+            replayed = EventLogReader(path).calc_statistics()
+            mismatches = {name: [statistics[name], value] for name, value in replayed.items() if statistics[name] != value}
+            if mismatches:
+                failures.append({'check': 'replay', 'format': fmt, 'mismatches': mismatches})
+    return failures
+
+
+def check_forks(params, seed, day=4):
+    """Продолжения со снимка посреди рабочего дня с измененными параметрами одинаковы на обоих движках"""
+    failures = []
+    for offset in range(30, 9 * 60, 95):
+        for fork_params in FORK_PARAMS:
+            results = {}
+            for engine in ('tick', 'event'):
+                simulation = get_engine(engine)(**params, seed=seed, keep_clients=False)
+                simulation.make_step((day - 1) * MIN_PER_DAY + offset)
+                try:
+                    fork = Checkpoint.take(simulation).fork(**fork_params)
+                except ValueError:
+                    # клерка, который обслуживает клиента, убрать нельзя
+                    results[engine] = None
+                    continue
+                fork.make_all_steps()
+                results[engine] = get_statistics(fork)
+            if results['tick'] != results['event']:
+                failures.append({'check': 'fork', 'minute': offset, 'params': fork_params, 'tick': results['tick'], 'event': results['event']})
+    return failures
+
+
+def check_network(params, seed):
+    """Сеть отделений с перенаправлением клиентов одинакова на обоих движках"""
+    results = {}
+    for engine in ('tick', 'event'):
+        with NetworkSimulation(make_branches(len(NETWORK_CONFIG), params, NETWORK_CONFIG), engine, workers=1, seed=seed) as network:
+            results[engine] = network.run()
+    if results['tick'] != results['event']:
+        return [{'check': 'network', 'tick': results['tick']['network'], 'event': results['event']['network']}]
+    return []
+
+
+def check_vector(params, seed, n_replications):
+    """Средние векторного движка статистически не отличаются от объектной модели"""
+    report = check_against_object_engine(params, n_replications, seed)
+    return [{'check': 'vector', 'statistic': name, **values} for name, values in report.items() if abs(values['z_score']) > Z_LIMIT]
+
+
+def check_replication(params, seed, n_replications):
+    """Оценка с управляющими переменными согласуется с обычным средним по тем же прогонам
+       (их точные средние, в том числе смесь прибыли по классам клиентов, посчитаны верно)"""
+    failures = []
+    plain = {}
+
+    def add_plain(idx, statistics):
+        for name, value in statistics.items():
+            plain.setdefault(name, RunningStat()).add(value)
+
+    summary = ReplicationRunner(params, 'event', seed=seed, control_variates=True).run(n_replications, callback=add_plain)
+    for name in ('profit', 'served_clients'):
+        std_error = plain[name].get_std() / plain[name].count ** 0.5
+        if abs(summary[name]['mean'] - plain[name].mean) > Z_LIMIT * std_error:
+            failures.append({'check': 'replication', 'statistic': name, 'controlled': summary[name]['mean'], 'plain': plain[name].mean})
+    return failures
+
+
+def run_checks(seed=0, vector_replications=100, replications=40):
+    """Все проверки совпадения движков; возвращает список расхождений (пустой - все совпадает)"""
+    failures = []
+    for name, changes in SCENARIOS.items():
+        params = dict(BASE_PARAMS, **changes)
+        for failure in check_engines(params, seed) + check_replay(params, seed):
+            failures.append(dict(failure, scenario=name))
+    overload = dict(BASE_PARAMS, **SCENARIOS['overload'])
+    failures += check_forks(dict(overload, max_q_len=30), seed)
+    failures += check_network(overload, seed)
+    if replications:
+        for name in ('default', 'classes'):
+            failures += [dict(failure, scenario=name) for failure in check_replication(dict(BASE_PARAMS, **SCENARIOS[name]), seed, replications)]
+    if vector_replications:
+        failures += check_vector(BASE_PARAMS, seed, vector_replications)
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Проверка совпадения движков: поминутный и событийный, журнал событий, снимки, сеть, векторный движок, управляющие переменные")
+    parser.add_argument('--seed', type=int, default=0, help="зерно генератора случайных чисел")
+    parser.add_argument('--vector-replications', type=int, default=100, help="прогонов для сравнения с векторным движком (0 - не сравнивать)")
+    parser.add_argument('--replications', type=int, default=40, help="прогонов для проверки управляющих переменных (0 - не проверять)")
+    args = parser.parse_args(argv)
+
+    failures = run_checks(args.seed, args.vector_replications, args.replications)
+    print(json.dumps({'failures': failures}, ensure_ascii=False, indent=2))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
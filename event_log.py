@@ -0,0 +1,180 @@
+import argparse
+import itertools
+import json
+import struct
+
+import numpy as np
+
+from business_calendar import WORK, BusinessCalendar
+
+MAGIC = b'BANKLOG1'
+KINDS = ('arrival', 'serve_start', 'finish', 'lost', 'end')
+KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+# value: прибыль для 'arrival' и 'finish', время ожидания для 'serve_start' и 'lost'
+RECORD_DTYPE = np.dtype([('minute', '<i8'), ('kind', 'i1'), ('client_id', '<i8'), ('clerk', '<i2'), ('value', '<f8')])
+CSV_COLUMNS = ','.join(RECORD_DTYPE.names)
+
+
+class EventLogWriter():
+    """Запись переходов клиентов в файл только на дозапись (двоичный формат или CSV)
+       Записи копятся в буфере фиксированного размера и сбрасываются на диск блоками.
+       Подписывается на события модели: EventLogWriter(path, simulation) ... close()
+       Для восстановления статистик журнал нужно подключать до первого шага моделирования"""
+
+    def __init__(self, path, simulation, fmt='binary', buffer_size=65536):
+        self.fmt = fmt
+        self.simulation = simulation
+        self.buffer = np.zeros(buffer_size, dtype=RECORD_DTYPE)
+        self.n_buffered = 0
+        header = json.dumps({'n_clerks': simulation.n_clerks,
+                             'salary': simulation.bank.clerks[0].salary,
+                             'start_minute': simulation.get_minute(),
+                             'calendar': simulation.calendar.get_config()}).encode()
+        if fmt == 'binary':
+            self.file = open(path, 'wb')
+            self.file.write(MAGIC + struct.pack('<I', len(header)) + header)
+        elif fmt == 'csv':
+            self.file = open(path, 'w')
+            self.file.write('# ' + header.decode() + '\n' + CSV_COLUMNS + '\n')
+        else:
+            raise ValueError(f"Unknown event log format: {fmt}")
+        simulation.subscribe(self)
+
+    def write(self, kind, client_id, clerk, value):
+        self.buffer[self.n_buffered] = (self.simulation.get_minute(), KIND_CODES[kind], client_id, clerk, value)
+        self.n_buffered += 1
+        if self.n_buffered == len(self.buffer):
+            self.flush()
+
+    def on_client_event(self, kind, client, clerk):
+        if kind in {'arrival', 'finish'}:
+            value = client.profit
+        else:
+            value = client.wait_time
+        self.write(kind, client.id, -1 if clerk is None else clerk.id, value)
+
+    def flush(self):
+        """Сброс буфера на диск"""
+        if self.fmt == 'binary':
+            self.buffer[:self.n_buffered].tofile(self.file)
+        else:
+            np.savetxt(self.file, self.buffer[:self.n_buffered], fmt=['%d', '%d', '%d', '%d', '%.17g'], delimiter=',')
+        self.n_buffered = 0
+
+    def close(self):
+        """Запись отметки конца моделирования и закрытие файла"""
+        self.write('end', -1, -1, 0)
+        self.flush()
+        self.file.close()
+        self.simulation.listeners.remove(self)
+
+
+class EventLogReader():
+    """Чтение журнала событий: двоичный файл отображается в память (numpy.memmap), CSV читается блоками"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            if file.read(len(MAGIC)) == MAGIC:
+                self.fmt = 'binary'
+                header_len, = struct.unpack('<I', file.read(4))
+                self.header = json.loads(file.read(header_len))
+                self.offset = len(MAGIC) + 4 + header_len
+            else:
+                self.fmt = 'csv'
+                file.seek(0)
+                self.header = json.loads(file.readline().decode()[2:])
+
+    def get_records(self):
+        """Все записи двоичного журнала без чтения в память"""
+        return np.memmap(self.path, dtype=RECORD_DTYPE, mode='r', offset=self.offset)
+
+    def iter_chunks(self, chunk_size=1 << 20):
+        """Записи журнала блоками не больше chunk_size"""
+        if self.fmt == 'binary':
+            records = self.get_records()
+            for start in range(0, len(records), chunk_size):
+                yield records[start:start + chunk_size]
+            return
+        with open(self.path) as file:
+            file.readline()
+            file.readline()
+            while True:
+                lines = list(itertools.islice(file, chunk_size))
+                if not lines:
+                    return
+                yield np.loadtxt(lines, dtype=RECORD_DTYPE, delimiter=',', ndmin=1)
+
+    def get_end_minute(self):
+        end = None
+        for chunk in self.iter_chunks():
+            ends = chunk['minute'][chunk['kind'] == KIND_CODES['end']]
+            if len(ends):
+                end = int(ends[-1])
+        return end
+
+    def replay(self, listener, until_minute=None):
+        """Воспроизведение табло: вызывает on_serve_start(client_id, window) и on_serve_finish(client_id) у listener"""
+        for chunk in self.iter_chunks():
+            if until_minute is not None:
+                chunk = chunk[chunk['minute'] < until_minute]
+            for record in chunk[(chunk['kind'] == KIND_CODES['serve_start']) | (chunk['kind'] == KIND_CODES['finish'])]:
+                if record['kind'] == KIND_CODES['serve_start']:
+                    listener.on_serve_start(int(record['client_id']), int(record['clerk']) + 1)
+                else:
+                    listener.on_serve_finish(int(record['client_id']))
+
+    def calc_statistics(self):
+        """Восстановление статистик bank.statistics по журналу без повторного моделирования
+           Длина очереди и число занятых клерков восстанавливаются поминутно из приходов, начал и окончаний обслуживания"""
+        start = self.header['start_minute']
+        end = self.get_end_minute()
+        horizon = end - start
+        queue_delta = np.zeros(horizon + 1)
+        busy_delta = np.zeros(horizon + 1)
+        statistics = {'profit': 0, 'served_clients': 0, 'lost_clients': 0}
+        waiting_time_sum = 0
+        waiting_clients = 0
+        for chunk in self.iter_chunks():
+            kind = chunk['kind']
+            offset = chunk['minute'] - start
+            finish = kind == KIND_CODES['finish']
+            lost = kind == KIND_CODES['lost']
+            serve_start = kind == KIND_CODES['serve_start']
+            statistics['profit'] += chunk['value'][finish].sum()
+            statistics['served_clients'] += int(finish.sum())
+            statistics['lost_clients'] += int(lost.sum())
+            lost_waits = chunk['value'][lost]
+            waiting_time_sum += chunk['value'][serve_start].sum() + lost_waits.sum()
+            waiting_clients += int(serve_start.sum()) + int((lost_waits > 0).sum())
+            queue_delta += np.bincount(offset[kind == KIND_CODES['arrival']], minlength=horizon + 1)
+            queue_delta -= np.bincount(offset[serve_start | lost], minlength=horizon + 1)
+            busy_delta += np.bincount(offset[serve_start], minlength=horizon + 1)
+            busy_delta -= np.bincount(offset[finish], minlength=horizon + 1)
+
+        # режим работы банка берется из календаря модели (старые журналы без календаря - стандартный режим)
+        calendar = BusinessCalendar.from_config(self.header['calendar']) if 'calendar' in self.header else BusinessCalendar()
+        work = calendar.get_states(start, end) == WORK
+        closings = calendar.count_closings(start, end)
+        statistics['profit'] = round(statistics['profit'] - closings * self.header['salary'] * self.header['n_clerks'])
+
+        q_lens = np.cumsum(queue_delta)[:horizon][work]
+        busy = np.cumsum(busy_delta)[:horizon][work]
+        statistics['avg_waiting_time'] = round(waiting_time_sum / max(waiting_clients, 1), 3)
+        statistics['avg_clerk_busy_time'] = round(busy.sum() / (self.header['n_clerks'] * max(len(busy), 1)), 3)
+        statistics['curr_q_len'] = int(q_lens[-1]) if len(q_lens) else 0
+        statistics['max_q_len'] = int(q_lens.max()) if len(q_lens) else 0
+        statistics['min_q_len'] = int(q_lens.min()) if len(q_lens) else 0
+        statistics['avg_q_len'] = round(q_lens.mean(), 3) if len(q_lens) else 0
+        return statistics
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Статистики по журналу событий без повторного моделирования")
+    parser.add_argument('path', help="файл журнала (двоичный или CSV)")
+    args = parser.parse_args(argv)
+    print(json.dumps(EventLogReader(args.path).calc_statistics(), ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+import heapq
+
+from simulation import Simulation
+
+# порядок обработки событий одной минуты
+EVENT_ORDER = {'calendar': 0, 'arrival': 1, 'transfer': 1, 'update': 1, 'finish': 2, 'renege': 2}
+
+
+class EventSimulation(Simulation):
+    """Событийный движок модели
+       Вместо перебора каждой минуты хранит очередь с приоритетом из событий (приход клиента, окончание обработки,
+       начало/конец перерыва, открытие/закрытие) и переходит сразу к ближайшему из них.
+       Минута с событием обрабатывается по тем же правилам, что и в поминутном движке,
+       поэтому при одинаковой последовательности случайных чисел статистики совпадают"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.events = []
+        self.n_events = 0
+        self.next_arrival = None
+        self.push_event(self.get_minute(), 'calendar')
+
+    def push_event(self, minute, kind, payload=None):
+        """Добавление события в очередь (не раньше текущей минуты: прошедшие минуты не обрабатываются повторно)"""
+        minute = max(minute, self.get_minute())
+        self.n_events += 1
+        heapq.heappush(self.events, (minute, EVENT_ORDER[kind], self.n_events, kind, payload))
+
+    def serve_started(self, clerk):
+        """Планирование окончания обработки нового клиента"""
+        super().serve_started(clerk)
+        self.push_event(self.get_minute() + clerk.serve_time, 'finish', clerk.id)
+
+    def deadline_added(self, minute):
+        """Минута ухода нетерпеливых клиентов обрабатывается как событие"""
+        self.push_event(minute, 'renege')
+
+    def accept_transfer(self, client):
+        """Перенаправленный клиент встает в очередь в текущую минуту: минута обрабатывается, чтобы его мог взять свободный клерк"""
+        super().accept_transfer(client)
+        if client.status == 'waiting':
+            self.push_event(self.get_minute(), 'transfer')
+
+    def update_params(self, **params):
+        """Изменение параметров посреди моделирования: текущая минута обрабатывается, чтобы новые клерки сразу взяли клиентов из очереди"""
+        super().update_params(**params)
+        self.push_event(self.get_minute(), 'update')
+
+    def skip_to(self, minute):
+        """Пропуск минут без событий: меняются только счетчики длины очереди и занятости клерков"""
+        skipped = minute - self.get_minute()
+        if skipped > 0 and self.get_state() == 'work':
+            self.bank.accumulators.add_minute(len(self.bank.client_queue), self.bank.n_busy, skipped, self.get_minute())
+        self.set_minute(minute)
+
+    def process_minute(self):
+        """Обработка минуты, в которую произошло хотя бы одно событие"""
+        minute = self.get_minute()
+        state = self.get_state()
+        if state == 'home':
+            if self.is_closing_time():
+                self.pay_salary()
+
+            self.drop_queue()
+            self.next_arrival = None
+            self.processed_clients.extend(self.bank.make_step('home'))
+            self.inc_time()
+
+        elif state == 'break':
+            self.next_arrival = None
+            self.processed_clients.extend(self.bank.make_step('break'))
+            self.inc_time()
+
+        else:
+            self.bank.start_work()
+            if self.next_arrival is None or self.next_arrival == minute:
+                if self.next_arrival is None:
+                    self.next_arrival = minute + self.gen_period_between_clients()
+                while self.next_arrival == minute:
+                    self.process_arrival()
+                    self.next_arrival = minute + self.gen_period_between_clients()
+                self.push_event(self.next_arrival, 'arrival')
+            self.processed_clients.extend(self.bank.make_step('work'))
+
+            self.inc_time()
+            self.bank.accumulators.add_minute(len(self.bank.client_queue), self.bank.n_busy, minute=minute)
+
+    def make_step(self, modeling_step=None):
+        """Моделирование 1 шага переходами от события к событию"""
+        if modeling_step is not None:
+            self.modeling_step = modeling_step
+        end = self.get_minute() + self.modeling_step
+        while self.events and self.events[0][0] < end:
+            minute = self.events[0][0]
+            while self.events and self.events[0][0] == minute:
+                _, _, _, kind, payload = heapq.heappop(self.events)
+                if kind == 'calendar':
+                    self.push_event(self.calendar.next_state_change(minute), 'calendar')
+            self.skip_to(minute)
+            self.process_minute()
+        self.skip_to(end)
+        self.time_to_client = None if self.next_arrival is None else self.next_arrival - end
+
+        self.calc_stats()
+        self.notify('step')
@@ -0,0 +1,237 @@
+import argparse
+import json
+import multiprocessing
+import os
+
+import numpy as np
+
+from business_calendar import BusinessCalendar
+from simulation import MODELING_END, MODELING_START, add_model_args, get_engine, get_model_params
+from streaming_stats import StatisticsAccumulators
+
+# длина шага сети по умолчанию, мин: перенаправленные клиенты доходят до соседнего отделения к следующему шагу
+NETWORK_STEP = 15
+
+
+def make_branches(n_branches, params, config=None):
+    """Описания отделений: общие параметры модели params, переопределенные значениями из config (список словарей по отделениям)
+       Соседи отделения (куда уходят клиенты из заполненной очереди) по умолчанию - предыдущее и следующее по кольцу"""
+    branches = []
+    for idx in range(n_branches):
+        branch = dict(params)
+        branch.update(config[idx] if config is not None and idx < len(config) else {})
+        if 'neighbours' not in branch:
+            branch['neighbours'] = sorted({(idx - 1) % n_branches, (idx + 1) % n_branches} - {idx})
+        branches.append(branch)
+    return branches
+
+
+class NetworkShard():
+    """Часть отделений сети, моделируемая в одном процессе
+       Каждое отделение - отдельная модель со своим зерном (зависит только от номера отделения, а не от разбиения на части)"""
+
+    def __init__(self, branches, indices, engine, entropy, calendar_config, overflow=True):
+        self.indices = list(indices)
+        self.simulations = {}
+        for idx in self.indices:
+            params = {name: value for name, value in branches[idx].items() if name != 'neighbours'}
+            simulation = get_engine(engine)(**params, seed=np.random.SeedSequence(entropy, spawn_key=(idx,)), keep_clients=False,
+                                            calendar=BusinessCalendar.from_config(calendar_config))
+            if overflow:
+                simulation.overflow = []
+            self.simulations[idx] = simulation
+        self.routed_in = dict.fromkeys(self.indices, 0)
+        self.routed_out = dict.fromkeys(self.indices, 0)
+
+    def step(self, n_minutes, incoming):
+        """Прием перенаправленных клиентов [(отделение, клиент)] и шаг всех отделений
+           Возвращает ушедших из заполненных очередей [(отделение, клиент)] и длины очередей отделений"""
+        for idx, client in incoming:
+            self.routed_in[idx] += 1
+            self.simulations[idx].accept_transfer(client)
+        outgoing = []
+        for idx, simulation in self.simulations.items():
+            simulation.make_step(n_minutes)
+            if simulation.overflow:
+                self.routed_out[idx] += len(simulation.overflow)
+                outgoing.extend((idx, client) for client in simulation.overflow)
+                simulation.overflow = []
+        return outgoing, {idx: len(simulation.bank.client_queue) for idx, simulation in self.simulations.items()}
+
+    def get_statistics(self):
+        """Статистики отделений и их накопители (для статистик сети)"""
+        statistics = {}
+        for idx, simulation in self.simulations.items():
+            statistics[idx] = dict(simulation.get_statistics(), routed_in=self.routed_in[idx], routed_out=self.routed_out[idx])
+        return statistics, {idx: simulation.bank.accumulators for idx, simulation in self.simulations.items()}
+
+
+def shard_worker(connection, *args):
+    """Процесс части сети: выполняет команды ('step', n_minutes, incoming), ('statistics',) и ('close',)"""
+    shard = NetworkShard(*args)
+    while True:
+        command = connection.recv()
+        if command[0] == 'step':
+            connection.send(shard.step(*command[1:]))
+        elif command[0] == 'statistics':
+            connection.send(shard.get_statistics())
+        else:
+            break
+    connection.close()
+
+
+class LocalShard():
+    """Часть сети в текущем процессе с тем же интерфейсом команд, что и у процесса"""
+    def __init__(self, *args):
+        self.shard = NetworkShard(*args)
+        self.result = None
+
+    def send(self, command):
+        if command[0] == 'step':
+            self.result = self.shard.step(*command[1:])
+        elif command[0] == 'statistics':
+            self.result = self.shard.get_statistics()
+
+    def recv(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class NetworkSimulation():
+    """Сеть отделений банка на общих часах и календаре
+       Отделения делятся на workers частей, каждая моделируется в своем процессе. Клиент, не поместившийся в очередь
+       (при overflow=True), направляется в соседнее отделение с самой короткой очередью на момент прошлого шага.
+       Обмен перенаправленными клиентами идет пакетами раз в step минут: клиент доходит до соседа к началу следующего шага.
+       Результат не зависит от числа процессов"""
+
+    def __init__(self, branches, engine='event', workers=None, seed=None, step=NETWORK_STEP, overflow=True, calendar=None):
+        self.branches = branches
+        self.step = step
+        self.overflow = overflow
+        self.workers = max(min(workers or os.cpu_count(), len(branches)), 1)
+        self.entropy = np.random.SeedSequence(seed).entropy
+        calendar_config = (BusinessCalendar() if calendar is None else calendar).get_config()
+        self.minute = MODELING_START
+        self.q_lens = dict.fromkeys(range(len(branches)), 0)
+        self.pending = []
+        self.n_lost_in_transit = 0
+
+        # отделения делятся на части подряд, чтобы соседи чаще оказывались в одном процессе
+        bounds = np.linspace(0, len(branches), self.workers + 1).astype(int)
+        self.shards = []
+        self.shard_of = {}
+        self.processes = []
+        for shard_idx, (start, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+            args = (branches, range(start, end), engine, self.entropy, calendar_config, overflow)
+            if self.workers == 1:
+                self.shards.append(LocalShard(*args))
+            else:
+                connection, child_connection = multiprocessing.Pipe()
+                process = multiprocessing.Process(target=shard_worker, args=(child_connection, *args), daemon=True)
+                process.start()
+                self.processes.append(process)
+                self.shards.append(connection)
+            for idx in range(start, end):
+                self.shard_of[idx] = shard_idx
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for shard in self.shards:
+            shard.send(('close',))
+            shard.close()
+        for process in self.processes:
+            process.join()
+        self.shards = []
+        self.processes = []
+
+    def steps_to_end(self):
+        return MODELING_END - self.minute
+
+    def route(self, outgoing):
+        """Выбор соседнего отделения для каждого ушедшего клиента; клиенты без соседей теряются"""
+        batches = [[] for _ in self.shards]
+        for idx, client in outgoing:
+            neighbours = self.branches[idx]['neighbours']
+            if not neighbours:
+                self.n_lost_in_transit += 1
+                continue
+            target = min(neighbours, key=lambda neighbour: (self.q_lens[neighbour], neighbour))
+            # клиент учитывается в очереди соседа, чтобы следующие ушедшие распределялись между соседями
+            self.q_lens[target] += 1
+            batches[self.shard_of[target]].append((target, client))
+        return batches
+
+    def make_step(self, n_minutes=None):
+        """Шаг всех отделений: рассылка пакетов перенаправленных клиентов и сбор новых"""
+        n_minutes = min(self.step if n_minutes is None else n_minutes, self.steps_to_end())
+        for shard, batch in zip(self.shards, self.pending):
+            shard.send(('step', n_minutes, batch))
+        for shard in self.shards[len(self.pending):]:
+            shard.send(('step', n_minutes, []))
+        outgoing = []
+        for shard in self.shards:
+            shard_outgoing, q_lens = shard.recv()
+            outgoing.extend(shard_outgoing)
+            self.q_lens.update(q_lens)
+        self.pending = self.route(outgoing)
+        self.minute += n_minutes
+
+    def run(self):
+        """Моделирование всего периода, возвращает статистики отделений и сети"""
+        while self.steps_to_end() > 0:
+            self.make_step()
+        return self.get_statistics()
+
+    def get_statistics(self):
+        """Статистики по отделениям и по сети в целом (средние - по всем рабочим минутам и клиентам сети)"""
+        for shard in self.shards:
+            shard.send(('statistics',))
+        branches = {}
+        accumulators = StatisticsAccumulators(0)
+        for shard in self.shards:
+            statistics, shard_accumulators = shard.recv()
+            branches.update(statistics)
+            for idx in statistics:
+                accumulators.merge(shard_accumulators[idx])
+        network = {name: sum(statistics[name] for statistics in branches.values())
+                   for name in ('profit', 'served_clients', 'lost_clients', 'routed_out')}
+        network['lost_clients'] += self.n_lost_in_transit
+        # клиенты, ушедшие на последнем шаге и еще не дошедшие до соседа
+        network['in_transit'] = sum(len(batch) for batch in self.pending)
+        network['avg_waiting_time'] = round(accumulators.waiting_time.get_avg(), 3)
+        network['avg_q_len'] = round(accumulators.q_len.get_avg(), 3)
+        network['max_q_len'] = accumulators.q_len.max
+        network['avg_clerk_busy_time'] = round(accumulators.busy_clerks.total / accumulators.clerk_minutes, 3) if accumulators.clerk_minutes else 0
+        return {'network': network, 'branches': [branches[idx] for idx in range(len(self.branches))]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Моделирование сети отделений банка с перенаправлением клиентов")
+    add_model_args(parser)
+    parser.add_argument('--branches', type=int, default=10, help="число отделений")
+    parser.add_argument('--config', default=None, help="JSON-файл со списком параметров отделений (n_clerks, max_q_len, query_range, neighbours, ...)")
+    parser.add_argument('--no-overflow', action='store_true', help="не перенаправлять клиентов из заполненной очереди")
+    parser.add_argument('--step', type=int, default=NETWORK_STEP, help="шаг обмена клиентами между отделениями, мин")
+    parser.add_argument('--workers', type=int, default=None, help="число процессов (по умолчанию - число ядер)")
+    parser.add_argument('--summary', action='store_true', help="выводить только статистики сети")
+    args = parser.parse_args(argv)
+
+    config = None
+    if args.config is not None:
+        with open(args.config, encoding='utf-8') as file:
+            config = json.load(file)
+    branches = make_branches(max(args.branches, len(config or [])), get_model_params(args), config)
+    with NetworkSimulation(branches, args.engine, args.workers, args.seed, args.step, not args.no_overflow) as network:
+        statistics = network.run()
+    print(json.dumps(statistics['network'] if args.summary else statistics, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
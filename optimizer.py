@@ -0,0 +1,135 @@
+import argparse
+import itertools
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from replication import run_replication
+from simulation import add_model_args, get_model_params
+from streaming_stats import RunningStat
+
+# версия схемы генерации случайных чисел: при ее изменении старые результаты в кэше не используются
+RANDOM_SCHEME = 2
+
+
+class ResultCache():
+    """Кэш результатов прогонов на диске (файл JSON Lines), ключ - параметры модели, движок, зерно и номер прогона
+       Новые результаты дописываются в конец файла, поэтому повторный перебор считает только новые точки"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.results = {}
+        if path is not None and os.path.exists(path):
+            with open(path, encoding='utf-8') as file:
+                for line in file:
+                    record = json.loads(line)
+                    self.results[record['key']] = record['statistics']
+
+    @staticmethod
+    def make_key(params, engine, seed, replication):
+        return json.dumps([sorted(params.items()), engine, seed, replication, RANDOM_SCHEME])
+
+    def get(self, key):
+        return self.results.get(key)
+
+    def put(self, key, statistics):
+        self.results[key] = statistics
+        if self.path is not None:
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(json.dumps({'key': key, 'statistics': statistics}, ensure_ascii=False) + '\n')
+
+
+def make_grid(base_params, **options):
+    """Все сочетания значений параметров; options - списки значений, например n_clerks=[2, 3, 4]"""
+    names = list(options)
+    grid = []
+    for values in itertools.product(*(options[name] for name in names)):
+        params = dict(base_params)
+        params.update(zip(names, values))
+        grid.append(params)
+    return grid
+
+
+class StaffingOptimizer():
+    """Подбор числа клерков, длины очереди и параметров потока, максимизирующих прибыль (за вычетом зарплаты)
+       Используется последовательное деление пополам (successive halving): все конфигурации оцениваются
+       по малому числу прогонов, после чего остается лучшая 1/eta часть, а число прогонов умножается на eta"""
+
+    def __init__(self, engine='event', workers=None, seed=0, cache_path=None, target_stat='profit'):
+        self.engine = engine
+        self.workers = workers or os.cpu_count()
+        self.seed = seed
+        self.cache = ResultCache(cache_path)
+        self.target_stat = target_stat
+        self.n_computed = 0
+
+    def evaluate(self, configs, n_replications):
+        """Прогоны 0..n_replications-1 для каждой конфигурации (недостающие в кэше считаются параллельно)
+           Возвращает список накопленных статистик target_stat по конфигурациям"""
+        keys = [[ResultCache.make_key(params, self.engine, self.seed, rep) for rep in range(n_replications)] for params in configs]
+        missing = [(params, rep, key) for params, config_keys in zip(configs, keys)
+                   for rep, key in enumerate(config_keys) if self.cache.get(key) is None]
+        if missing:
+            with ProcessPoolExecutor(self.workers) as executor:
+                futures = {executor.submit(run_replication, params, self.engine, self.seed, rep): key for params, rep, key in missing}
+                for future in as_completed(futures):
+                    self.cache.put(futures[future], future.result())
+                    self.n_computed += 1
+
+        results = []
+        for config_keys in keys:
+            stat = RunningStat()
+            for key in config_keys:
+                stat.add(self.cache.get(key)[self.target_stat])
+            results.append(stat)
+        return results
+
+    def optimize(self, configs, min_replications=4, max_replications=64, eta=3):
+        """Отбор лучших конфигураций; возвращает историю раундов и итоговый рейтинг"""
+        history = []
+        n_replications = min_replications
+        while True:
+            results = self.evaluate(configs, n_replications)
+            ranking = sorted(zip(configs, results), key=lambda item: item[1].mean, reverse=True)
+            history.append([{'params': params, 'mean': stat.mean, 'std': stat.get_std(), 'n': stat.count} for params, stat in ranking])
+            if len(configs) <= 1 or n_replications >= max_replications:
+                break
+            configs = [params for params, _ in ranking[:max(math.ceil(len(configs) / eta), 1)]]
+            n_replications = min(n_replications * eta, max_replications)
+        return {'best': history[-1][0], 'ranking': history[-1], 'rounds': history}
+
+
+def parse_range(value):
+    """Диапазон в виде 'от-до', например '0-15'"""
+    low, high = value.split('-')
+    return (int(low), int(high))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Подбор штата и длины очереди по прибыли")
+    add_model_args(parser)
+    parser.add_argument('--clerks-options', type=int, nargs='+', default=list(range(2, 8)), help="варианты числа клерков")
+    parser.add_argument('--max-q-len-options', type=int, nargs='+', default=list(range(10, 16)), help="варианты максимальной длины очереди")
+    parser.add_argument('--query-range-options', type=parse_range, nargs='+', default=None, help="варианты промежутка между заявками, 'от-до'")
+    parser.add_argument('--serv-duration-range-options', type=parse_range, nargs='+', default=None, help="варианты времени обслуживания, 'от-до'")
+    parser.add_argument('--min-replications', type=int, default=4, help="число прогонов в первом раунде")
+    parser.add_argument('--max-replications', type=int, default=64, help="число прогонов в последнем раунде")
+    parser.add_argument('--eta', type=int, default=3, help="во сколько раз сокращается число конфигураций за раунд")
+    parser.add_argument('--workers', type=int, default=None, help="число процессов (по умолчанию - число ядер)")
+    parser.add_argument('--cache', default='optimizer_cache.jsonl', help="файл кэша результатов")
+    args = parser.parse_args(argv)
+
+    base_params = get_model_params(args)
+    options = {'n_clerks': args.clerks_options, 'max_q_len': args.max_q_len_options}
+    if args.query_range_options:
+        options['query_range'] = args.query_range_options
+    if args.serv_duration_range_options:
+        options['serv_duration_range'] = args.serv_duration_range_options
+    optimizer = StaffingOptimizer(args.engine, args.workers, args.seed if args.seed is not None else 0, args.cache)
+    result = optimizer.optimize(make_grid(base_params, **options), args.min_replications, args.max_replications, args.eta)
+    print(json.dumps({'best': result['best'], 'ranking': result['ranking'], 'computed': optimizer.n_computed}, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+import argparse
+import functools
+import importlib
+import json
+import os
+import sys
+import time
+
+# точки замера: (фаза, модуль, класс, метод); методы оборачиваются только на время включенного профилирования
+INSTRUMENTATION_POINTS = (
+    ('step', 'simulation', 'Simulation', 'make_step'),
+    ('step', 'event_simulation', 'EventSimulation', 'make_step'),
+    ('rng.arrival', 'randomizer', 'Randomizer', 'gen_period_between_clients'),
+    ('rng.profit', 'randomizer', 'Randomizer', 'gen_profit'),
+    ('rng.service', 'randomizer', 'Randomizer', 'gen_serv_duration'),
+    ('queue', 'bank', 'Bank', 'process_new_client'),
+    ('queue', 'bank', 'Bank', 'drop_q'),
+    ('clerks', 'bank', 'Bank', 'make_step'),
+    ('stats', 'simulation', 'Simulation', 'calc_stats'),
+    ('ui.clerks', 'system', 'System', 'draw_clerks_status'),
+    ('ui.stats', 'system', 'System', 'show_statistic'),
+    ('ui.tablo', 'system', 'System', 'add_info_tablo'),
+    ('ui.tablo', 'system', 'System', 'remove_tablo_line'),
+    ('ui.datetime', 'system', 'System', 'recalc_datetime'),
+    ('ui.refresh', 'system', 'System', 'refresh'),
+)
+N_BUCKETS = 64
+
+
+class PhaseStat():
+    """Число вызовов, суммарное время и гистограмма длительностей фазы (корзины по степеням двойки наносекунд)"""
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.buckets = [0] * N_BUCKETS
+
+    def add(self, duration):
+        self.count += 1
+        self.total += duration
+        self.buckets[min(duration.bit_length(), N_BUCKETS - 1)] += 1
+
+    def quantile(self, q):
+        """Верхняя граница корзины, в которую попадает квантиль уровня q (в наносекундах)"""
+        threshold = q * self.count
+        cumulative = 0
+        for idx, value in enumerate(self.buckets):
+            cumulative += value
+            if cumulative >= threshold:
+                return 1 << idx
+        return 1 << (N_BUCKETS - 1)
+
+
+class Profiler():
+    """Профилирование фаз шага моделирования: счетчики вызовов, время и гистограммы длительностей по фазам
+       Пока профилирование выключено, код модели не меняется и ничего не стоит; enable() подменяет методы из
+       INSTRUMENTATION_POINTS обертками с замером времени, disable() возвращает исходные методы.
+       Время фазы включает вложенные фазы (например, 'step' включает все остальные)
+       При trace=True сохраняются отдельные вызовы для экспорта в формат Chrome Trace (chrome://tracing, Perfetto)"""
+
+    def __init__(self, trace=False, max_events=1000000):
+        self.trace = trace
+        self.max_events = max_events
+        self.phases = {}
+        self.events = []
+        self.patched = []
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.disable()
+
+    def record(self, phase, start, end):
+        if phase not in self.phases:
+            self.phases[phase] = PhaseStat()
+        self.phases[phase].add(end - start)
+        if self.trace and len(self.events) < self.max_events:
+            self.events.append((phase, start, end))
+
+    def wrap(self, phase, method):
+        perf_counter_ns = time.perf_counter_ns
+        record = self.record
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                record(phase, start, perf_counter_ns())
+        return wrapper
+
+    def enable(self):
+        """Подмена методов обертками (модули, которые не импортируются, например интерфейс без tkinter, пропускаются)"""
+        for phase, module_name, class_name, method_name in INSTRUMENTATION_POINTS:
+            try:
+                cls = getattr(importlib.import_module(module_name), class_name)
+            except ImportError:
+                continue
+            method = cls.__dict__[method_name]
+            self.patched.append((cls, method_name, method))
+            setattr(cls, method_name, self.wrap(phase, method))
+
+    def disable(self):
+        for cls, method_name, method in reversed(self.patched):
+            setattr(cls, method_name, method)
+        self.patched = []
+
+    def get_report(self):
+        """Сводка по фазам, отсортированная по суммарному времени"""
+        report = {}
+        for phase, stat in sorted(self.phases.items(), key=lambda item: -item[1].total):
+            report[phase] = {'calls': stat.count,
+                             'total_ms': round(stat.total / 1e6, 3),
+                             'mean_us': round(stat.total / stat.count / 1e3, 3),
+                             'p50_us': stat.quantile(0.5) / 1e3,
+                             'p99_us': stat.quantile(0.99) / 1e3}
+        return report
+
+    def format_report(self):
+        lines = [f"{'фаза':16} {'вызовов':>10} {'всего, мс':>12} {'среднее, мкс':>13} {'p50, мкс':>10} {'p99, мкс':>10}"]
+        for phase, values in self.get_report().items():
+            lines.append(f"{phase:16} {values['calls']:10d} {values['total_ms']:12.1f} {values['mean_us']:13.2f} "
+                         f"{values['p50_us']:10.2f} {values['p99_us']:10.2f}")
+        return '\n'.join(lines)
+
+    def export_chrome_trace(self, path):
+        """Запись сохраненных вызовов в формате Chrome Trace Event (JSON, события 'X' с временем в микросекундах)"""
+        origin = min((start for _, start, _ in self.events), default=0)
+        events = [{'name': phase, 'cat': phase.split('.')[0], 'ph': 'X', 'pid': os.getpid(), 'tid': 0,
+                   'ts': (start - origin) / 1e3, 'dur': (end - start) / 1e3} for phase, start, end in self.events]
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+
+
+def main(argv=None):
+    from simulation import add_model_args, get_engine, get_model_params
+
+    parser = argparse.ArgumentParser(description="Профиль фаз моделирования: модель, генератор случайных чисел, интерфейс")
+    add_model_args(parser)
+    parser.add_argument('--step', type=int, default=30, help="шаг моделирования, мин")
+    parser.add_argument('--gui', action='store_true', help="профилировать работу в интерфейсе (сводка - после закрытия окна)")
+    parser.add_argument('--trace', default=None, help="файл для экспорта вызовов в формате Chrome Trace")
+    args = parser.parse_args(argv)
+
+    with Profiler(trace=args.trace is not None) as profiler:
+        if args.gui:
+            from system import System
+            System().start_system()
+        else:
+            simulation = get_engine(args.engine)(**get_model_params(args), seed=args.seed, keep_clients=False)
+            while simulation.steps_to_end() > 0:
+                simulation.make_step(min(args.step, simulation.steps_to_end()))
+    print(profiler.format_report(), file=sys.stderr)
+    if args.trace is not None:
+        profiler.export_chrome_trace(args.trace)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+import bisect
+import math
+
+import numpy as np
+
+BLOCK_SIZE = 4096
+
+# рациональные приближения обратной функции нормального распределения (P. J. Acklam), относительная погрешность 1.15e-9
+PPF_A = (-3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02, 1.383577518672690e+02, -3.066479806614716e+01, 2.506628277459239e+00)
+PPF_B = (-5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02, 6.680131188771972e+01, -1.328068155288572e+01, 1.0)
+PPF_C = (-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00, -2.549732539343734e+00, 4.374664141464968e+00, 2.938163982698783e+00)
+PPF_D = (7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00, 3.754408661907416e+00, 1.0)
+PPF_TAIL = 0.02425
+
+erfc = np.vectorize(math.erfc, otypes=[float])
+
+
+def norm_cdf(x):
+    """Функция стандартного нормального распределения (scipy.special.ndtr, если scipy установлен)
+       scipy импортируется при первом вызове: модель с равномерным распределением его не загружает"""
+    try:
+        from scipy.special import ndtr
+    except ImportError:
+        return 0.5 * erfc(-np.asarray(x, dtype=float) / math.sqrt(2))
+    return ndtr(x)
+
+
+def norm_ppf(p):
+    """Квантили стандартного нормального распределения (scipy.special.ndtri, если scipy установлен)
+       Без scipy - приближение Акклама, уточненное шагом метода Галлея (погрешность порядка точности double)"""
+    try:
+        from scipy.special import ndtri
+    except ImportError:
+        pass
+    else:
+        return ndtri(p)
+    p = np.asarray(p, dtype=float)
+    # считается квантиль нижней половины (1 - p для p > 0.5 вычисляется точно), знак - по половине
+    lower = np.minimum(p, 1 - p)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        q = np.sqrt(-2 * np.log(lower))
+        r = (lower - 0.5) ** 2
+        x = np.where(lower < PPF_TAIL, np.polyval(PPF_C, q) / np.polyval(PPF_D, q), (lower - 0.5) * np.polyval(PPF_A, r) / np.polyval(PPF_B, r))
+        u = (norm_cdf(x) - lower) * math.sqrt(2 * math.pi) * np.exp(x * x / 2)
+        x = x - u / (1 + x * u / 2)
+    x = np.where(p > 0.5, -x, x)
+    return np.where(p <= 0, -np.inf, np.where(p >= 1, np.inf, x))
+
+
+def truncnorm_ppf(range, probs):
+    """Квантили усеченного нормального распределения в границах range (среднее - середина, сигма - четверть ширины)"""
+    mean = (range[0] + range[1]) // 2
+    sd = max((mean - range[0]) // 2, 1)
+    low, high = norm_cdf((range[0] - mean) / sd), norm_cdf((range[1] - mean) / sd)
+    values = mean + sd * norm_ppf(low + (high - low) * probs)
+    return np.clip(values, range[0], range[1])
+
+
+def distr_ppf(distr, range, probs):
+    """Квантили уровней probs выбранного распределения в границах (для аналитических оценок)"""
+    if distr == 'uniform':
+        return range[0] + (range[1] - range[0]) * np.asarray(probs)
+    elif distr == 'normal':
+        return truncnorm_ppf(range, np.asarray(probs))
+
+
+class Pool():
+    """Запас заранее сгенерированных значений, пополняемый блоками по мере расходования
+       fill(*args, size) возвращает массив из size новых значений"""
+    def __init__(self, fill, block_size=BLOCK_SIZE, *args):
+        self.fill = fill
+        self.block_size = block_size
+        self.args = args
+        self.values = []
+        self.pos = 0
+
+    def next(self):
+        """Очередное значение из запаса"""
+        if self.pos == len(self.values):
+            self.values = self.fill(*self.args, self.block_size).tolist()
+            self.pos = 0
+        self.pos += 1
+        return self.values[self.pos - 1]
+
+
+# независимые потоки случайных чисел: промежутки между клиентами, время обслуживания, прибыль, класс клиента, терпение
+# (новые потоки добавляются в конец, чтобы зерна прежних не менялись)
+STREAMS = ('arrival', 'service', 'profit', 'class', 'patience')
+
+
+def stream_seed(seed, stream):
+    """Зерно потока stream - дочерний SeedSequence зерна модели (само зерно не изменяется)"""
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return np.random.SeedSequence(seed.entropy, spawn_key=tuple(seed.spawn_key) + (STREAMS.index(stream),))
+
+
+class Stream():
+    """Поток случайных чисел одного назначения со своим генератором
+       При antithetic=True вместо равномерного u выдается 1 - u (антитетическая пара к потоку с тем же зерном)"""
+    def __init__(self, seed=None, block_size=BLOCK_SIZE, antithetic=False):
+        self.generator = np.random.default_rng(seed)
+        self.block_size = block_size
+        self.antithetic = antithetic
+        self.uniforms = Pool(self.random, block_size)
+        self.normals = {}
+
+    def random(self, size):
+        """Блок равномерных на [0, 1) значений"""
+        values = self.generator.random(size)
+        return 1 - values if self.antithetic else values
+
+    def uniform_distr_value(self, range):
+        """Генерирует число из равномерного распределения в границах"""
+        return range[0] + (range[1] - range[0]) * self.uniforms.next()
+
+    def normal_distr_value(self, range):
+        """Генерирует число из нормального распределения в границах"""
+        if range not in self.normals:
+            self.normals[range] = Pool(self.truncnorm_block, self.block_size, range)
+        return self.normals[range].next()
+
+    def truncnorm_block(self, range, size):
+        """Блок значений усеченного нормального распределения (метод обратной функции распределения)"""
+        return truncnorm_ppf(range, self.random(size))
+
+    def distr_value(self, distr, range):
+        if distr == 'uniform':
+            return self.uniform_distr_value(range)
+        elif distr == 'normal':
+            return self.normal_distr_value(range)
+
+    def distr_values(self, distr, range, size):
+        """Массив из size значений выбранного распределения в границах (для векторных движков)"""
+        if distr == 'uniform':
+            return range[0] + (range[1] - range[0]) * self.random(size)
+        elif distr == 'normal':
+            return self.truncnorm_block(range, size)
+
+
+class Randomizer():
+    """Генерирование случайных величин модели из отдельных потоков для каждого назначения (STREAMS)
+       При одном зерне две конфигурации модели получают одинаковые промежутки, времена обслуживания и прибыли
+       по порядку клиентов (общие случайные числа), даже если число клиентов и клерков у них разное"""
+    def __init__(self, seed=None, block_size=BLOCK_SIZE, antithetic=False):
+        self.antithetic = antithetic
+        self.streams = {stream: Stream(stream_seed(seed, stream), block_size, antithetic) for stream in STREAMS}
+
+    def distr_values(self, distr, range, size, stream):
+        """Массив из size значений выбранного распределения в границах из потока stream (для векторных движков)"""
+        return self.streams[stream].distr_values(distr, range, size)
+
+    def gen_profit(self, distr, profit_range):
+        """Генерирование прибыли от пользователя"""
+        return self.streams['profit'].distr_value(distr, profit_range)
+
+    def gen_serv_duration(self, distr, serv_duration_range):
+        """Генерирование времени обработки клиента (с последующей дискретизацией в минуты)"""
+        return round(self.streams['service'].distr_value(distr, serv_duration_range))
+
+    def gen_client_class(self, cumulative_shares):
+        """Номер класса клиента по накопленным долям классов"""
+        return bisect.bisect_right(cumulative_shares[:-1], self.streams['class'].uniforms.next())
+
+    def gen_patience(self, distr, patience_range):
+        """Генерирование терпения клиента в очереди (в минутах, не меньше 1)"""
+        return max(round(self.streams['patience'].distr_value(distr, patience_range)), 1)
+
+    def gen_period_between_clients(self, distr, query_range, time_coef, decrease_coef):
+        """Генирирование промежутка между клиентами (с последующей дискретизацией в минуты)"""
+        val = round((1 + time_coef + decrease_coef) * self.streams['arrival'].distr_value(distr, query_range))
+        return min(max(val, query_range[0]), query_range[1])
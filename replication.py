@@ -0,0 +1,245 @@
+import argparse
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+from randomizer import norm_ppf
+from simulation import add_model_args, get_engine, get_model_params
+from streaming_stats import RunningStat
+
+
+def replication_seed(entropy, replication):
+    """Зерно прогона с номером replication (совпадает с replication-м потомком SeedSequence(entropy).spawn)"""
+    return np.random.SeedSequence(entropy, spawn_key=(replication,))
+
+
+def average_results(results):
+    """Среднее по прогонам пары: словари статистик или пары (статистики, управляющие переменные)"""
+    if len(results) == 1:
+        return results[0]
+    if isinstance(results[0], tuple):
+        return tuple(average_results(list(parts)) for parts in zip(*results))
+    return {name: sum(result[name] for result in results) / len(results) for name in results[0]}
+
+
+def run_replication(params, engine, entropy, replication, control_variates=False, antithetic=False):
+    """Один независимый прогон месяца (выполняется в процессе-обработчике)
+       При control_variates=True возвращает пару (статистики, управляющие переменные).
+       При antithetic=True выполняется пара прогонов с одним зерном - обычный и антитетический - и возвращается их среднее"""
+    results = []
+    for antithetic_run in ((False, True) if antithetic else (False,)):
+        simulation = get_engine(engine)(**params, seed=replication_seed(entropy, replication), keep_clients=False, antithetic=antithetic_run)
+        statistics = simulation.run()
+        results.append((statistics, simulation.get_control_variates()) if control_variates else statistics)
+    return average_results(results)
+
+
+def run_comparison(params_a, params_b, engine, entropy_a, entropy_b, replication, antithetic=False):
+    """Разность статистик двух конфигураций (A - B) в одном прогоне; при entropy_a == entropy_b - с общими случайными числами"""
+    statistics_a = run_replication(params_a, engine, entropy_a, replication, antithetic=antithetic)
+    statistics_b = run_replication(params_b, engine, entropy_b, replication, antithetic=antithetic)
+    return {name: statistics_a[name] - statistics_b[name] for name in statistics_a}
+
+
+def student_cdf(x, df):
+    """Функция распределения Стьюдента с целым числом степеней свободы (конечный ряд, Abramowitz, Stegun 26.7.3-4)"""
+    theta = math.atan(x / math.sqrt(df))
+    cos2 = math.cos(theta) ** 2
+    term, total = 1.0, 1.0
+    for k in range(2 if df % 2 else 1, df - 1, 2):
+        term *= cos2 * k / (k + 1)
+        total += term
+    if df % 2:
+        prob = 2 / math.pi * (theta + (math.sin(theta) * math.cos(theta) * total if df > 1 else 0))
+    else:
+        prob = math.sin(theta) * total
+    return (1 + prob) / 2
+
+
+def student_ppf(q, df):
+    """Квантиль распределения Стьюдента (scipy.stats.t, если scipy установлен; импорт - при первом вызове)
+       Без scipy: разложение Корниша-Фишера (Abramowitz, Stegun 26.7.5), при df < 100 уточняемое методом Ньютона
+       по точной функции распределения"""
+    try:
+        from scipy.stats import t as student
+    except ImportError:
+        pass
+    else:
+        return float(student.ppf(q, df))
+    if df == 1:
+        return math.tan(math.pi * (q - 0.5))
+    z = float(norm_ppf(q))
+    terms = ((z ** 3 + z) / 4,
+             (5 * z ** 5 + 16 * z ** 3 + 3 * z) / 96,
+             (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / 384,
+             (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / 92160)
+    x = z + sum(term / df ** (power + 1) for power, term in enumerate(terms))
+    if df < 100:
+        log_norm = math.lgamma((df + 1) / 2) - math.lgamma(df / 2) - math.log(df * math.pi) / 2
+        for _ in range(4):
+            x -= (student_cdf(x, df) - q) / math.exp(log_norm - (df + 1) / 2 * math.log1p(x * x / df))
+    return x
+
+
+def summarize(stat, confidence=0.95):
+    """Среднее, стандартное отклонение и доверительный интервал по значениям статистики"""
+    half_width = math.inf
+    if stat.count > 1:
+        half_width = student_ppf((1 + confidence) / 2, stat.count - 1) * stat.get_std() / math.sqrt(stat.count)
+    return {'mean': stat.mean,
+            'std': stat.get_std(),
+            'ci_low': stat.mean - half_width,
+            'ci_high': stat.mean + half_width,
+            'half_width': half_width,
+            'n': stat.count}
+
+
+def summarize_controlled(values, controls, control_means, confidence=0.95):
+    """Оценка с управляющими переменными: среднее Y - beta (X - E[X]), beta - МНК-регрессия Y на X по прогонам
+       controls - матрица прогоны x управляющие переменные, control_means - их точные средние"""
+    y = np.asarray(values, dtype=float)
+    design = np.column_stack([np.ones(len(y)), np.asarray(controls, dtype=float) - control_means])
+    n, n_params = design.shape
+    if n <= n_params:
+        stat = RunningStat()
+        for value in y:
+            stat.add(value)
+        return summarize(stat, confidence)
+    coef = np.linalg.lstsq(design, y, rcond=None)[0]
+    residuals = y - design @ coef
+    var = residuals @ residuals / (n - n_params)
+    mean_var = var * np.linalg.pinv(design.T @ design)[0, 0]
+    half_width = student_ppf((1 + confidence) / 2, n - n_params) * math.sqrt(mean_var)
+    plain_var = y.var(ddof=1) / n
+    return {'mean': float(coef[0]),
+            'std': math.sqrt(var),
+            'ci_low': float(coef[0]) - half_width,
+            'ci_high': float(coef[0]) + half_width,
+            'half_width': half_width,
+            'n': n,
+            'variance_reduction': 1 - mean_var / plain_var if plain_var > 0 else 0.0}
+
+
+class ReplicationRunner():
+    """Запуск N независимых прогонов модели в пуле процессов
+       Прогон i всегда получает i-й дочерний поток зерна seed, поэтому результат каждого прогона воспроизводим
+       независимо от числа процессов и порядка завершения.
+       При control_variates=True оценки уточняются управляющими переменными - средними разыгранных времени обслуживания
+       и прибыли, точные математические ожидания которых дает модуль analytic.
+       При antithetic=True каждый прогон - среднее антитетической пары"""
+
+    def __init__(self, params, engine='event', workers=None, seed=None, control_variates=False, antithetic=False):
+        self.params = params
+        self.engine = engine
+        self.antithetic = antithetic
+        self.workers = workers or os.cpu_count()
+        self.entropy = np.random.SeedSequence(seed).entropy
+        self.control_means = None
+        if control_variates:
+            if params.get('arrivals') is not None:
+                raise ValueError("Control variates are unavailable for trace-driven arrivals: input means are unknown")
+            from analytic import get_control_means
+            self.control_means = get_control_means(params['distr'], params['profit_range'], params.get('serv_duration_range', (2, 30)),
+                                                   params.get('client_classes'))
+
+    def submit(self, executor, replication):
+        return executor.submit(run_replication, self.params, self.engine, self.entropy, replication,
+                               self.control_means is not None, self.antithetic)
+
+    def iter_results(self, n_replications):
+        """Генератор пар (номер прогона, статистики) в порядке завершения"""
+        with ProcessPoolExecutor(self.workers) as executor:
+            pending = {}
+            next_idx = 0
+            try:
+                while next_idx < n_replications or pending:
+                    # держим в работе не больше 2 задач на процесс, чтобы ранняя остановка не тратила лишнее время
+                    while next_idx < n_replications and len(pending) < 2 * self.workers:
+                        future = self.submit(executor, next_idx)
+                        pending[future] = next_idx
+                        next_idx += 1
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield pending.pop(future), future.result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def run(self, n_replications, target_half_width=None, target_stat='profit', confidence=0.95, min_replications=10, callback=None):
+        """Прогоны с агрегацией статистик
+           Если задан target_half_width, прогоны останавливаются, как только полуширина доверительного интервала
+           для target_stat станет не больше заданной (но не раньше min_replications прогонов)"""
+        stats = {}
+        values = {}
+        controls = []
+        for idx, result in self.iter_results(n_replications):
+            if self.control_means is None:
+                statistics = result
+            else:
+                statistics, control_variates = result
+                controls.append([control_variates[name] for name in self.control_means])
+                for name, value in statistics.items():
+                    values.setdefault(name, []).append(value)
+            for name, value in statistics.items():
+                stats.setdefault(name, RunningStat()).add(value)
+            if callback is not None:
+                callback(idx, statistics)
+            if target_half_width is not None and stats[target_stat].count >= min_replications and \
+                self.summarize(target_stat, stats, values, controls, confidence)['half_width'] <= target_half_width:
+                break
+        return {name: self.summarize(name, stats, values, controls, confidence) for name in stats}
+
+    def summarize(self, name, stats, values, controls, confidence):
+        if self.control_means is None:
+            return summarize(stats[name], confidence)
+        return summarize_controlled(values[name], controls, list(self.control_means.values()), confidence)
+
+
+class ComparisonRunner(ReplicationRunner):
+    """Оценка разности статистик двух конфигураций (A - B) по парным прогонам
+       С общими случайными числами (по умолчанию) прогон i обеих конфигураций использует одни и те же потоки
+       промежутков, времени обслуживания и прибыли, поэтому шум в разности во многом сокращается"""
+
+    def __init__(self, params_a, params_b, engine='event', workers=None, seed=None, antithetic=False, common_random_numbers=True):
+        super().__init__(params_a, engine, workers, seed, antithetic=antithetic)
+        self.params_b = params_b
+        self.entropy_b = self.entropy if common_random_numbers else np.random.SeedSequence(self.entropy).generate_state(4).tolist()
+
+    def submit(self, executor, replication):
+        return executor.submit(run_comparison, self.params, self.params_b, self.engine, self.entropy, self.entropy_b, replication, self.antithetic)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Независимые прогоны модели с доверительными интервалами")
+    add_model_args(parser)
+    parser.add_argument('--replications', type=int, default=100, help="максимальное число прогонов")
+    parser.add_argument('--workers', type=int, default=None, help="число процессов (по умолчанию - число ядер)")
+    parser.add_argument('--confidence', type=float, default=0.95, help="уровень доверия")
+    parser.add_argument('--half-width', type=float, default=None, help="требуемая полуширина интервала для ранней остановки")
+    parser.add_argument('--target-stat', default='profit', help="статистика для критерия ранней остановки")
+    parser.add_argument('--control-variates', action='store_true', help="уточнять оценки управляющими переменными")
+    parser.add_argument('--antithetic', action='store_true', help="прогоны антитетическими парами")
+    parser.add_argument('--compare-clerks', type=int, default=None, help="сравнить с конфигурацией с другим числом клерков")
+    parser.add_argument('--compare-max-q-len', type=int, default=None, help="сравнить с конфигурацией с другой максимальной длиной очереди")
+    parser.add_argument('--independent', action='store_true', help="сравнивать по независимым прогонам (без общих случайных чисел)")
+    args = parser.parse_args(argv)
+
+    params = get_model_params(args)
+    if args.compare_clerks is None and args.compare_max_q_len is None:
+        runner = ReplicationRunner(params, args.engine, args.workers, args.seed, args.control_variates, args.antithetic)
+    else:
+        params_b = dict(params)
+        if args.compare_clerks is not None:
+            params_b['n_clerks'] = args.compare_clerks
+        if args.compare_max_q_len is not None:
+            params_b['max_q_len'] = args.compare_max_q_len
+        runner = ComparisonRunner(params, params_b, args.engine, args.workers, args.seed, args.antithetic, not args.independent)
+    summary = runner.run(args.replications, args.half_width, args.target_stat, args.confidence)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,427 @@
+import argparse
+import json
+import math
+
+from bank import Bank
+from business_calendar import HOURS_PER_DAY, MIN_PER_DAY, MIN_PER_HOUR, WORK_HOURS, BusinessCalendar
+from client import Client
+from client_classes import ClassStatistics, get_client_classes, get_cumulative_shares
+from client_log import ClientLog
+from randomizer import Randomizer
+
+STEP_OPTIONS = {"1 мин": 1, "5 мин": 5, "30 мин": 30, "1 час": MIN_PER_HOUR, "2 часа": 2 * MIN_PER_HOUR, "1 день": HOURS_PER_DAY * MIN_PER_HOUR}
+MODELING_START = WORK_HOURS[0] * MIN_PER_HOUR # 10:00 1'st day
+MODELING_END = 30 * MIN_PER_DAY + MODELING_START # 10:00 31'st day
+# поправки промежутка между клиентами в долях ширины query_range: каждый 5-й день и вечером (с EVENING_START) клиенты приходят чаще
+# (значения можно оценить по реальной трассе приходов: arrival_trace.fit_trace)
+TIME_FACTORS = {'fifth_day': -1, 'evening': -2}
+EVENING_START = 16 * MIN_PER_HOUR
+
+
+def calc_time_coef(date, time, query_range, time_factors=TIME_FACTORS):
+    """Расчет коэффициента для генерации промежутка между людьми, который задает зависимость потока от текщего дня и времени"""
+    coef = 0
+    if date % 5 == 0:
+        coef += time_factors['fifth_day'] / (query_range[1] - query_range[0])
+    if time >= EVENING_START:
+        coef += time_factors['evening'] / (query_range[1] - query_range[0])
+    return coef
+
+
+class Simulation():
+    """Модель банка без графического интерфейса
+       Интерфейс (или любой другой наблюдатель) подписывается через subscribe и получает события:
+       on_serve_start(client_id, window), on_serve_finish(client_id), on_step(),
+       а также on_client_event(kind, client, clerk) для каждого перехода клиента: 'arrival', 'serve_start', 'finish', 'lost'
+       Обслуженные и потерянные клиенты записываются в колоночные журналы (keep_clients=False - только счетчики)
+       Режим работы (часы по дням недели, перерыв, праздники) задается календарем BusinessCalendar,
+       выбор свободного клерка - политикой назначения assignment ('in_order', 'lru' или объект из модуля assignment).
+       antithetic=True - антитетический прогон к прогону с тем же зерном.
+       time_series - объект TimeSeries (модуль time_series) для поминутных рядов и сводок по часам и дням.
+       client_classes - классы клиентов (ClientClass или словари, модуль client_classes) с долями, прибылью, приоритетом
+       и терпением; patience_range - терпение клиентов без своего диапазона (None - ждут до закрытия).
+       time_factors - поправки потока по дням и времени (по умолчанию TIME_FACTORS).
+       arrivals - источник реальных приходов (TraceArrivals из модуля arrival_trace): время прихода, обслуживания и прибыль
+       берутся из трассы, а не из генератора случайных чисел"""
+
+    def __init__(self, n_clerks, max_q_len, distr, query_range, profit_range, serv_duration_range=(2, 30), modeling_step=30, seed=None, keep_clients=True,
+                 calendar=None, assignment='in_order', antithetic=False, time_series=None, client_classes=None, patience_range=None,
+                 time_factors=None, arrivals=None):
+        self.n_clerks = n_clerks
+        self.max_queue_len = max_q_len
+        self.distr = distr
+        self.query_range = tuple(query_range)
+        self.profit_range = tuple(profit_range)
+        self.serv_duration_range = tuple(serv_duration_range)
+        self.modeling_step = modeling_step
+        self.modeling_period = 30 * HOURS_PER_DAY * MIN_PER_HOUR # месяц ~= 30 дней * 24 часа * 60 минут
+
+        self.calendar = BusinessCalendar() if calendar is None else calendar
+        self.time_factors = TIME_FACTORS if time_factors is None else dict(time_factors)
+        self.arrivals = arrivals
+        self.randomizer = Randomizer(seed, antithetic=antithetic)
+        self.date = 1
+        self.time = MODELING_START
+        self.client_classes = None if client_classes is None else get_client_classes(client_classes)
+        self.patience_range = None if patience_range is None else tuple(patience_range)
+        impatient = self.patience_range is not None or any(client_class.patience_range is not None for client_class in self.client_classes or ())
+        self.bank = Bank(self.n_clerks, self.max_queue_len, self, assignment, priorities=self.client_classes is not None, deadlines=impatient)
+        self.bank.accumulators.time_series = time_series
+        self.class_statistics = None
+        if self.client_classes is not None:
+            self.class_shares = get_cumulative_shares(self.client_classes)
+            self.class_statistics = ClassStatistics(self.client_classes)
+        if impatient:
+            self.bank.statistics['reneged_clients'] = 0
+
+        self.time_to_client = None
+        self.curr_client_id = 0
+        self.processed_clients = ClientLog(keep_clients)
+        self.lost_clients = ClientLog(keep_clients)
+        # список для клиентов, не поместившихся в очередь (сеть отделений перенаправляет их в соседнее), None - клиенты теряются
+        self.overflow = None
+
+        self.listeners = []
+
+    def __getstate__(self):
+        """Состояние для сохранения (pickle) без подписчиков: интерфейс и открытые файлы не сохраняются"""
+        state = self.__dict__.copy()
+        state['listeners'] = []
+        return state
+
+    def update_params(self, n_clerks=None, max_q_len=None, distr=None, query_range=None, profit_range=None, serv_duration_range=None):
+        """Изменение параметров модели посреди моделирования (для сценариев "что если")"""
+        if n_clerks is not None:
+            self.bank.set_n_clerks(n_clerks)
+            self.n_clerks = n_clerks
+        if max_q_len is not None:
+            self.bank.max_q_len = self.max_queue_len = max_q_len
+        if distr is not None:
+            self.distr = distr
+        if query_range is not None:
+            self.query_range = tuple(query_range)
+        if profit_range is not None:
+            self.profit_range = tuple(profit_range)
+        if serv_duration_range is not None:
+            self.serv_duration_range = tuple(serv_duration_range)
+
+    def subscribe(self, listener):
+        """Подписка наблюдателя на события модели"""
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        """Отписка наблюдателя"""
+        self.listeners.remove(listener)
+
+    def notify(self, event, *args):
+        """Рассылка события всем подписчикам, у которых есть обработчик on_<event>"""
+        for listener in self.listeners:
+            handler = getattr(listener, 'on_' + event, None)
+            if handler is not None:
+                handler(*args)
+
+    def serve_started(self, clerk):
+        """Клерк начал обработку очередного клиента"""
+        if self.class_statistics is not None:
+            self.class_statistics.add('serve_start', clerk.client)
+        self.notify('serve_start', clerk.client.id, clerk.id + 1)
+        self.notify('client_event', 'serve_start', clerk.client, clerk)
+
+    def serve_finished(self, clerk):
+        """Клерк закончил обработку клиента"""
+        if self.class_statistics is not None:
+            self.class_statistics.add('finish', clerk.client)
+        self.notify('serve_finish', clerk.client.id)
+        self.notify('client_event', 'finish', clerk.client, clerk)
+
+    def get_minute(self):
+        """Текущее время в минутах от начала первого дня"""
+        return (self.date - 1) * HOURS_PER_DAY * MIN_PER_HOUR + self.time
+
+    def set_minute(self, minute):
+        """Установка текущего времени по числу минут от начала первого дня"""
+        self.date = minute // MIN_PER_DAY + 1
+        self.time = minute % MIN_PER_DAY
+
+    def get_state(self):
+        """Состояние банка в текущую минуту: 'work', 'break' или 'home' (закрыто)"""
+        return self.calendar.get_state(self.get_minute())
+
+    def is_closing_time(self):
+        """Текущая минута - момент закрытия банка в рабочий день"""
+        return self.calendar.is_closing_time(self.get_minute())
+
+    def make_step(self, modeling_step=None):
+        """Моделирование 1 шага
+           В зависимости от рандомного значения промежутка между клиентами, создаются новые клиенты и направляются в банк в очередь обработки
+           Поминутно моделируются вызовы соответствующего метода для класса Bank,
+           нерабочий промежуток без занятых клерков пропускается целиком до следующей смены режима"""
+        if modeling_step is not None:
+            self.modeling_step = modeling_step
+        end = self.get_minute() + self.modeling_step
+        while self.get_minute() < end:
+            state = self.get_state()
+            if state == 'home':
+                if self.is_closing_time():
+                    self.pay_salary()
+
+                self.drop_queue()
+                self.time_to_client = None
+                self.processed_clients.extend(self.bank.make_step('home'))
+                self.inc_time()
+
+            elif state == 'break':
+                self.time_to_client = None
+                self.processed_clients.extend(self.bank.make_step('break'))
+                self.inc_time()
+
+            else:
+                self.bank.start_work()
+                if self.time_to_client is None:
+                    self.time_to_client = self.gen_period_between_clients()
+                while self.time_to_client == 0:
+                    self.process_arrival()
+                    self.time_to_client = self.gen_period_between_clients()
+                self.processed_clients.extend(self.bank.make_step())
+
+                self.inc_time()
+                self.time_to_client -= 1
+                self.bank.accumulators.add_minute(len(self.bank.client_queue), self.bank.n_busy, minute=self.get_minute() - 1)
+
+            if state != 'work' and not self.bank.n_busy:
+                # до смены режима ничего не происходит: очередь пуста или не движется, клиенты не приходят
+                # ... но не дальше ближайшего ухода нетерпеливых клиентов (в перерыв очередь сохраняется)
+                next_minute = self.calendar.next_state_change(self.get_minute() - 1)
+                deadline = self.bank.get_next_deadline()
+                if deadline is not None:
+                    next_minute = min(next_minute, deadline)
+                self.set_minute(min(next_minute, end))
+
+        self.calc_stats()
+        self.notify('step')
+
+    def gen_period_between_clients(self):
+        """Промежуток до следующего клиента с учетом текущего дня, времени и загруженности
+           (или до следующего прихода из трассы; после конца трассы клиенты больше не приходят)"""
+        if self.arrivals is not None:
+            period = self.arrivals.get_period(self.get_minute())
+            return math.inf if period is None else period
+        return self.randomizer.gen_period_between_clients(self.distr, self.query_range, self.calc_time_coef(), self.calc_decrease_coef())
+
+    def process_arrival(self):
+        """Приход нового клиента в текущую минуту"""
+        client_class = None
+        if self.client_classes is not None:
+            client_class = self.client_classes[self.randomizer.gen_client_class(self.class_shares)]
+        service_demand = None
+        if self.arrivals is not None:
+            service_demand, profit = self.arrivals.pop()
+        elif client_class is None or client_class.profit_range is None:
+            profit = self.randomizer.gen_profit(self.distr, self.profit_range)
+        else:
+            profit = self.randomizer.gen_profit(self.distr, client_class.profit_range)
+        self.bank.accumulators.add_arrival_profit(profit)
+        client = Client(self.curr_client_id, self.time, profit)
+        client.service_demand = service_demand
+        if client_class is not None:
+            client.client_class = client_class.name
+            client.priority = client_class.priority
+            self.class_statistics.add('arrival', client)
+        self.set_deadline(client, client_class)
+        self.notify('client_event', 'arrival', client, None)
+        if self.overflow is not None and self.bank.is_full():
+            self.overflow.append(client)
+        else:
+            lost_client = self.bank.process_new_client(client)
+            if lost_client:
+                self.lose_client(lost_client)
+        self.curr_client_id += 1
+
+    def set_deadline(self, client, client_class):
+        """Срок ухода клиента из очереди по терпению его класса (или общему терпению модели), None - ждет до закрытия"""
+        patience_range = self.patience_range if client_class is None or client_class.patience_range is None else client_class.patience_range
+        client.deadline = None if patience_range is None else self.get_minute() + self.randomizer.gen_patience(self.distr, patience_range)
+
+    def accept_transfer(self, client):
+        """Прием клиента, перенаправленного из другого отделения; ожидание отсчитывается с момента прихода сюда
+           Приоритет и терпение берутся из настроек этого отделения: класс, которого здесь нет, получает свои счетчики
+           и приоритет 0, а срок прежнего отделения (к этому времени он мог истечь) заменяется новым
+           В нерабочее время или при заполненной очереди клиент теряется"""
+        client.start_time = self.time
+        client_class = None
+        if self.client_classes is not None:
+            client_class = next((item for item in self.client_classes if item.name == client.client_class), None)
+            if client_class is None and client.client_class is not None:
+                self.class_statistics.add_class(client.client_class)
+        client.priority = 0 if client_class is None else client_class.priority
+        self.set_deadline(client, client_class)
+        if self.get_state() == 'work':
+            client = self.bank.process_new_client(client)
+        else:
+            self.bank.statistics['lost_clients'] += 1
+        if client:
+            self.lose_client(client)
+
+    def lose_client(self, client):
+        """Клиент ушел, не встав в очередь"""
+        client.status = 'lost'
+        client.wait_time = 0
+        self.client_lost(client)
+
+    def client_reneged(self, client):
+        """Клиент ушел из очереди, не дождавшись обслуживания (время ожидания - фактическое)"""
+        self.client_lost(client)
+
+    def client_lost(self, client):
+        self.lost_clients.append(client)
+        if self.class_statistics is not None:
+            self.class_statistics.add('lost', client)
+        self.notify('client_event', 'lost', client, None)
+
+    def deadline_added(self, minute):
+        """Появилась новая минута ухода нетерпеливых клиентов (поминутный движок проверяет сроки каждую минуту)"""
+
+    def drop_queue(self):
+        """Закрытие: все клиенты из очереди уходят"""
+        for client in self.bank.drop_q():
+            self.client_lost(client)
+
+    def inc_time(self):
+        """+ 1 минута к текущему времени"""
+        if self.time == 23 * MIN_PER_HOUR + 59:
+            self.time = 0
+            self.date += 1
+        else:
+            self.time += 1
+
+    def steps_to_end(self):
+        """Число минут до конца периода моделирования"""
+        return MODELING_END - self.get_minute()
+
+    def make_all_steps(self):
+        """Моделирование до конца периода"""
+        self.make_step(self.steps_to_end())
+
+    def run(self):
+        """Моделирование всего периода, возвращает итоговые статистики"""
+        self.make_all_steps()
+        return self.get_statistics()
+
+    def calc_time_coef(self):
+        """Коэффициент зависимости потока клиентов от текущего дня и времени"""
+        return calc_time_coef(self.date, self.time, self.query_range, self.time_factors)
+
+    def calc_decrease_coef(self):
+        """Расчет коэффициента для генерации промежутка между людьми, который задает зависимость от длины очереди и числа потерянных клиентов"""
+        return (len(self.lost_clients) / 100 + len(self.bank.client_queue) / 3) / (self.query_range[1] - self.query_range[0])
+
+    def pay_salary(self):
+        """Выплата зарплаты клеркам в момент закрытия"""
+        self.bank.statistics['profit'] -= self.bank.clerks[0].salary * self.n_clerks
+
+    def calc_stats(self):
+        """Пересчет статистик после очередного шага моделирования (значения берутся из накопителей банка)"""
+        self.bank.accumulators.report(self.bank.statistics)
+
+    def get_class_statistics(self):
+        """Статистики по классам клиентов (None, если классы не заданы)"""
+        return None if self.class_statistics is None else self.class_statistics.get_statistics()
+
+    def get_control_variates(self):
+        """Средние разыгранных входных величин за прогон (управляющие переменные для оценок по прогонам)"""
+        return self.bank.accumulators.get_control_variates()
+
+    def get_statistics(self):
+        """Копия текущих статистик (прибыль округляется только при выдаче)"""
+        statistics = dict(self.bank.statistics)
+        statistics['profit'] = round(statistics['profit'])
+        return statistics
+
+
+def get_engine(engine='tick'):
+    """Класс модели по названию движка: 'tick' - поминутный, 'event' - событийный"""
+    if engine == 'tick':
+        return Simulation
+    elif engine == 'event':
+        from event_simulation import EventSimulation
+        return EventSimulation
+    raise ValueError(f"Unknown engine: {engine}")
+
+
+def run_simulation(n_clerks, max_q_len, distr, query_range, profit_range, serv_duration_range=(2, 30), engine='tick', seed=None, assignment='in_order',
+                   antithetic=False, client_classes=None, patience_range=None, time_factors=None, arrivals=None):
+    """Прогон модели на весь период без интерфейса"""
+    return get_engine(engine)(n_clerks, max_q_len, distr, query_range, profit_range, serv_duration_range, seed=seed, keep_clients=False,
+                              assignment=assignment, antithetic=antithetic, client_classes=client_classes, patience_range=patience_range,
+                              time_factors=time_factors, arrivals=arrivals).run()
+
+
+def add_model_args(parser):
+    """Параметры модели в командной строке (те же, что задаются в интерфейсе)"""
+    parser.add_argument('--clerks', type=int, default=3, help="число клерков")
+    parser.add_argument('--max-q-len', type=int, default=10, help="максимальная длина очереди")
+    parser.add_argument('--distr', choices=['uniform', 'normal'], default='uniform', help="распределение")
+    parser.add_argument('--query-range', type=int, nargs=2, default=(0, 15), metavar=('FROM', 'TO'), help="промежуток между заявками, мин")
+    parser.add_argument('--profit-range', type=int, nargs=2, default=(100, 10000), metavar=('FROM', 'TO'), help="прибыль от клиента")
+    parser.add_argument('--serv-duration-range', type=int, nargs=2, default=(2, 30), metavar=('FROM', 'TO'), help="время обслуживания, мин")
+    parser.add_argument('--assignment', choices=['in_order', 'lru'], default='in_order', help="выбор свободного клерка: по номеру или дольше всех свободный")
+    parser.add_argument('--client-classes', default=None, help="JSON-файл со списком классов клиентов (name, share, profit_range, priority, patience_range)")
+    parser.add_argument('--patience-range', type=int, nargs=2, default=None, metavar=('FROM', 'TO'), help="терпение клиентов в очереди, мин")
+    parser.add_argument('--time-factors', type=float, nargs=2, default=None, metavar=('FIFTH_DAY', 'EVENING'),
+                        help="поправки потока каждый 5-й день и вечером в долях ширины query_range (по умолчанию TIME_FACTORS; оценка по трассе - arrival_trace fit)")
+    parser.add_argument('--engine', choices=['tick', 'event'], default='event', help="движок: поминутный или событийный")
+    parser.add_argument('--seed', type=int, default=None, help="зерно генератора случайных чисел")
+
+
+def get_model_params(args):
+    """Словарь параметров модели из разобранных аргументов командной строки (классы клиентов, терпение и поправки потока - только если заданы)"""
+    params = {'n_clerks': args.clerks,
+              'max_q_len': args.max_q_len,
+              'distr': args.distr,
+              'query_range': tuple(args.query_range),
+              'profit_range': tuple(args.profit_range),
+              'serv_duration_range': tuple(args.serv_duration_range),
+              'assignment': args.assignment}
+    if args.client_classes is not None:
+        with open(args.client_classes, encoding='utf-8') as file:
+            params['client_classes'] = json.load(file)
+    if args.patience_range is not None:
+        params['patience_range'] = tuple(args.patience_range)
+    if args.time_factors is not None:
+        params['time_factors'] = dict(zip(('fifth_day', 'evening'), args.time_factors))
+    return params
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Моделирование обслуживания в банке без интерфейса")
+    add_model_args(parser)
+    parser.add_argument('--event-log', default=None, help="файл для журнала событий клиентов")
+    parser.add_argument('--event-log-format', choices=['binary', 'csv'], default='binary', help="формат журнала событий")
+    parser.add_argument('--time-series', default=None, help="файл для сводок длины очереди и занятости клерков по часам и дням (JSON)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    time_series = None
+    if args.time_series is not None:
+        from time_series import TimeSeries
+        time_series = TimeSeries()
+    simulation = get_engine(args.engine)(**get_model_params(args), seed=args.seed, keep_clients=False, time_series=time_series)
+    writer = None
+    if args.event_log is not None:
+        from event_log import EventLogWriter
+        writer = EventLogWriter(args.event_log, simulation, args.event_log_format)
+    statistics = simulation.run()
+    if simulation.get_class_statistics() is not None:
+        statistics['classes'] = simulation.get_class_statistics()
+    if writer is not None:
+        writer.close()
+    if time_series is not None:
+        with open(args.time_series, 'w', encoding='utf-8') as file:
+            json.dump({resolution: time_series.get_report(resolution) for resolution in ('hour', 'day')}, file, ensure_ascii=False)
+    print(json.dumps(statistics, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+import math
+
+
+class RunningStat():
+    """Потоковая статистика: число значений, сумма, минимум, максимум, среднее и дисперсия (метод Уэлфорда)"""
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.last = None
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value, weight=1):
+        """Добавление значения weight раз"""
+        if weight <= 0:
+            return
+        self.count += weight
+        self.total += value * weight
+        delta = value - self.mean
+        self.mean += delta * weight / self.count
+        self.m2 += delta * (value - self.mean) * weight
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.last = value
+
+    def merge(self, other):
+        """Объединение с другой статистикой (формула Чана)"""
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.__dict__.update(other.__dict__)
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.last = other.last
+
+    def get_avg(self):
+        """Среднее значение (0, если значений не было)"""
+        return self.total / self.count if self.count else 0
+
+    def get_var(self):
+        """Выборочная дисперсия"""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def get_std(self):
+        return math.sqrt(self.get_var())
+
+
+class Histogram():
+    """Гистограмма целочисленных значений (минут) с возможностью объединения"""
+    def __init__(self):
+        self.counts = []
+        self.count = 0
+
+    def add(self, value, weight=1):
+        idx = max(int(value), 0)
+        if idx >= len(self.counts):
+            self.counts.extend([0] * (idx + 1 - len(self.counts)))
+        self.counts[idx] += weight
+        self.count += weight
+
+    def merge(self, other):
+        if len(other.counts) > len(self.counts):
+            self.counts.extend([0] * (len(other.counts) - len(self.counts)))
+        for idx, value in enumerate(other.counts):
+            self.counts[idx] += value
+        self.count += other.count
+
+    def quantile(self, q):
+        """Квантиль уровня q (0 < q <= 1)"""
+        if not self.count:
+            return 0
+        threshold = q * self.count
+        cumulative = 0
+        for idx, value in enumerate(self.counts):
+            cumulative += value
+            if cumulative >= threshold:
+                return idx
+        return len(self.counts) - 1
+
+
+class StatisticsAccumulators():
+    """Накопители статистик банка, обновляемые по мере событий; итоговые значения читаются за O(1)"""
+    def __init__(self, n_clerks, time_series=None):
+        self.n_clerks = n_clerks
+        # поминутные ряды и сводки по часам и дням (TimeSeries из модуля time_series), None - не ведутся
+        self.time_series = time_series
+        self.q_len = RunningStat()
+        self.busy_clerks = RunningStat()
+        self.waiting_time = RunningStat()
+        self.waiting_time_hist = Histogram()
+        self.clerk_minutes = 0
+        # разыгранные входные величины - управляющие переменные с известными средними (модуль analytic)
+        self.serv_duration = RunningStat()
+        self.arrival_profit = RunningStat()
+
+    def add_minute(self, q_len, busy_clerks, n_minutes=1, minute=None):
+        """Учет n_minutes рабочих минут (с минуты minute от начала первого дня) с одинаковыми длиной очереди и числом занятых клерков"""
+        self.q_len.add(q_len, n_minutes)
+        self.busy_clerks.add(busy_clerks, n_minutes)
+        self.clerk_minutes += self.n_clerks * n_minutes
+        if self.time_series is not None:
+            self.time_series.add(minute, q_len, busy_clerks / self.n_clerks, n_minutes)
+
+    def add_waiting_time(self, waiting_time):
+        """Учет времени ожидания клиента (при начале обслуживания или уходе из очереди)"""
+        self.waiting_time.add(waiting_time)
+        self.waiting_time_hist.add(waiting_time)
+
+    def add_serv_duration(self, serv_duration):
+        self.serv_duration.add(serv_duration)
+
+    def add_arrival_profit(self, profit):
+        self.arrival_profit.add(profit)
+
+    def get_control_variates(self):
+        """Средние разыгранных времени обслуживания и прибыли от пришедших клиентов"""
+        return {'serv_duration': self.serv_duration.get_avg(), 'profit': self.arrival_profit.get_avg()}
+
+    def get_waiting_time_quantiles(self, levels=(0.5, 0.95, 0.99)):
+        return {level: self.waiting_time_hist.quantile(level) for level in levels}
+
+    def merge(self, other):
+        self.q_len.merge(other.q_len)
+        self.busy_clerks.merge(other.busy_clerks)
+        self.waiting_time.merge(other.waiting_time)
+        self.waiting_time_hist.merge(other.waiting_time_hist)
+        self.clerk_minutes += other.clerk_minutes
+        self.serv_duration.merge(other.serv_duration)
+        self.arrival_profit.merge(other.arrival_profit)
+        if self.time_series is not None and other.time_series is not None:
+            self.time_series.merge(other.time_series)
+
+    def report(self, statistics):
+        """Запись текущих значений в словарь статистик банка"""
+        if not self.q_len.count:
+            return
+        statistics['max_q_len'] = self.q_len.max
+        statistics['min_q_len'] = self.q_len.min
+        statistics['avg_q_len'] = round(self.q_len.get_avg(), 3)
+        statistics['curr_q_len'] = self.q_len.last
+        statistics['avg_waiting_time'] = round(self.waiting_time.get_avg(), 3)
+        statistics['avg_clerk_busy_time'] = round(self.busy_clerks.total / self.clerk_minutes, 3)
@@ -1,88 +1,43 @@
+import time
 import tkinter as tk 
-from tkinter import ttk
-
-from collections import deque
-
-from bank import Bank
-from client import Client 
-
-from scipy.stats import truncnorm
-import random
-import numpy as np
-
-WORK_HOURS = (10, 19)
-WORK_HOURS_FR = (10, 17)
-BREAK_HOURS = (12, 13)
-MIN_PER_HOUR = 60
-HOURS_PER_DAY = 24 
-
-class Randomizer():
-    def uniform_distr_value(self, range):
-        """Генерирует число из равномерного распределения в границах"""
-        return random.uniform(range[0], range[1])
-
-    def normal_distr_value(self, range):
-        """Генерирует число из нормального распределения в границах"""
-        mean = (range[0] + range[1]) // 2
-        sd = max((mean - range[0]) // 2, 1)
-        return truncnorm((range[0] - mean) / sd, (range[1] - mean) / sd, loc=mean, scale=sd).rvs()
-
-    def gen_profit(self, distr, profit_range):
-        """Генерирование прибыли от пользователя"""
-        if distr == 'uniform':
-            gen_fun = self.uniform_distr_value
-        elif distr == 'normal':
-            gen_fun = self.normal_distr_value
-        return gen_fun(profit_range)
-
-
-    def gen_serv_duration(self, distr, serv_duration_range):
-        """Генерирование времени обработки клиента (с последующей дискретизацией в минуты)"""
-        if distr == 'uniform':
-            gen_fun = self.uniform_distr_value
-        elif distr == 'normal':
-            gen_fun = self.normal_distr_value
-        return round(gen_fun(serv_duration_range))
-
-    def gen_period_between_clients(self, distr, query_range, time_coef, decrease_coef):
-        """Генирирование промежутка между клиентами (с последующей дискретизацией в минуты)"""
-        if distr == 'uniform':
-            gen_fun = self.uniform_distr_value
-        elif distr == 'normal':
-            gen_fun = self.normal_distr_value
-
-        val = round((1 + time_coef + decrease_coef) * gen_fun(query_range))
-        return min(max(val, query_range[0]), query_range[1])
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import messagebox, ttk
+
+from analytic import estimate
+from simulation import Simulation, STEP_OPTIONS
+from worker import SimulationWorker
+
+# частота обновления экрана при моделировании до конца, мс между перерисовками
+REFRESH_OPTIONS = {"10 раз/с": 100, "4 раза/с": 250, "1 раз/с": 1000}
+# скорость воспроизведения, минут модели в секунду
+PLAYBACK_OPTIONS = {"1 мин/с": 1, "10 мин/с": 10, "1 ч/с": 60, "1 день/с": 1440}
+# кадров в секунду при воспроизведении
+PLAYBACK_FPS = 25
+# пауза во вводе параметров перед пересчетом оценки и период проверки готовности расчета, мс
+ESTIMATE_DELAY_MS = 300
+ESTIMATE_POLL_MS = 50
 
 
 class System():
     def __init__(self):
-        self.n_clerks = None
-        self.clerks_range = (2, 7)
-        self.date = None 
-        self.time = None
-        self.with_breaks = True 
-        self.randomizer = Randomizer()
-
-        self.max_queue_len = None
-
-        self.distr = None
-        self.query_range = None 
-        self.profit_range = None 
+        self.clerks_range = (1, 500)
+        self.clerks_per_row = 20
         self.serv_duration_range = (2, 30)
+        self.simulation = None
+        self.worker = None
+        self.playback = None
+        # элементы холста и табло создаются один раз, дальше меняются только их свойства
+        self.clerk_items = []
+        self.clerk_fills = []
+        self.tablo_items = {}
+        # изменения табло с последней перерисовки: клиент -> номер окна (None - клиент ушел)
+        self.pending_tablo = {}
+        self.refresh_scheduled = False
+        # оценка считается в отдельном потоке; показывается только результат последнего запроса
+        self.estimate_executor = ThreadPoolExecutor(max_workers=1)
+        self.estimate_job = None
+        self.estimate_future = None
 
-        self.modeling_step = None
-        self.modeling_period = 30 * HOURS_PER_DAY * MIN_PER_HOUR # месяц ~= 30 дней * 24 часа * 60 минут
-
-        self.bank = None 
-
-        self.time_to_client = None
-        self.curr_client_id = 0
-        self.processed_clients = []
-        self.lost_clients = []
-        self.q_lens = []
-        self.clerk_busy_time = []
-        
     def start_system(self):
         """Старт системы. Отрисовка основного интерфейса"""
         # ОКНО ПРИЛОЖЕНИЯ
@@ -103,9 +58,8 @@ class System():
         clerks_label.pack()
         self.clerks_var = tk.IntVar()
         self.clerks_var.set(3)
-        clerks_options = list(range(self.clerks_range[0], self.clerks_range[1] + 1))
-        clerks_optionmenu = tk.OptionMenu(left_frame, self.clerks_var, *clerks_options)
-        clerks_optionmenu.pack()
+        clerks_spinbox = tk.Spinbox(left_frame, from_=self.clerks_range[0], to=self.clerks_range[1], textvariable=self.clerks_var, width=5)
+        clerks_spinbox.pack()
 
         max_q_len_label = tk.Label(left_frame, text="Максимальная длина очереди:")
         max_q_len_label.pack()
@@ -175,7 +129,7 @@ class System():
         
         self.step_var = tk.StringVar()
         self.step_var.set('30 мин')
-        step_options = ['1 мин', '5 мин', '30 мин', '1 час', '2 часа', '1 день']
+        step_options = list(STEP_OPTIONS)
         step_optionmenu = tk.OptionMenu(left_frame, self.step_var, *step_options)
         step_optionmenu.pack(side='top')
 
@@ -191,6 +145,42 @@ class System():
         button_start = tk.Button(frame_buttons, text="до конца", command=self.make_all_steps)
         button_start.pack(side='left')
 
+        frame_playback = tk.Frame(left_frame)
+        frame_playback.pack()
+        self.play_button = tk.Button(frame_playback, text="воспроизвести", command=self.toggle_playback)
+        self.play_button.pack(side='left')
+        self.speed_var = tk.StringVar()
+        self.speed_var.set('10 мин/с')
+        speed_optionmenu = tk.OptionMenu(frame_playback, self.speed_var, *PLAYBACK_OPTIONS)
+        speed_optionmenu.pack(side='left')
+
+        refresh_label = tk.Label(left_frame, text="Обновление экрана:")
+        refresh_label.pack()
+        self.refresh_var = tk.StringVar()
+        self.refresh_var.set('10 раз/с')
+        refresh_optionmenu = tk.OptionMenu(left_frame, self.refresh_var, *REFRESH_OPTIONS)
+        refresh_optionmenu.pack()
+
+        self.progress = ttk.Progressbar(left_frame, length=200, maximum=1.0)
+        self.progress.pack(pady=(5, 0))
+        frame_run_buttons = tk.Frame(left_frame)
+        frame_run_buttons.pack()
+        self.pause_button = tk.Button(frame_run_buttons, text="пауза", command=self.toggle_pause, state='disabled')
+        self.pause_button.pack(side='left')
+        self.cancel_button = tk.Button(frame_run_buttons, text="отмена", command=self.cancel_run, state='disabled')
+        self.cancel_button.pack(side='left')
+
+        estimate_label = tk.Label(left_frame, text="Оценка без моделирования (M/M/c/K):", font=('calibri', '12', 'bold'))
+        estimate_label.pack(pady=(10, 0))
+        self.estimate_var = tk.StringVar()
+        estimate_values = tk.Label(left_frame, textvariable=self.estimate_var, justify='left')
+        estimate_values.pack()
+        for var in (self.clerks_var, self.max_q_len_var, self.distribution_var):
+            var.trace_add('write', self.schedule_estimate)
+        for entry in (self.time_from_entry, self.time_to_entry, self.profit_from_entry, self.profit_to_entry):
+            entry.bind('<KeyRelease>', self.schedule_estimate)
+        self.show_estimate()
+
 
         self.right_frame = tk.Frame(self.window)
         self.right_frame.pack(side='left', padx=10, pady=10, fill=None, expand=False)
@@ -204,15 +194,19 @@ class System():
         
         # Get all entry values
 
-        self.n_clerks = self.clerks_var.get()
-        self.date = 1
-        self.time = 10 * MIN_PER_HOUR # 10:00 1'st day
-        self.max_queue_len = self.max_q_len_var.get()
-        self.distr = self.distribution_var.get()
-        self.query_range = (int(self.time_from_entry.get()), int(self.time_to_entry.get()))
-        self.profit_range = (int(self.profit_from_entry.get()), int(self.profit_to_entry.get()))
-        self.modeling_step = {"1 мин": 1, "5 мин": 5, "30 мин": 30, "1 час": 60, "2 часа": 120, "1 день": HOURS_PER_DAY * MIN_PER_HOUR}.get(self.step_var.get())
-        self.bank = Bank(self.n_clerks, self.max_queue_len, self)
+        self.stop_playback()
+        self.cancel_run()
+        self.simulation = Simulation(self.clerks_var.get(),
+                                     self.max_q_len_var.get(),
+                                     self.distribution_var.get(),
+                                     (int(self.time_from_entry.get()), int(self.time_to_entry.get())),
+                                     (int(self.profit_from_entry.get()), int(self.profit_to_entry.get())),
+                                     self.serv_duration_range,
+                                     STEP_OPTIONS[self.step_var.get()])
+        self.simulation.subscribe(self)
+        self.clerk_items = []
+        self.tablo_items = {}
+        self.pending_tablo = {}
 
         # Right panel drawing
 
@@ -278,192 +272,265 @@ class System():
         self.show_statistic(is_start=True)
 
     
-    def recalc_datetime(self):
-        """Перерисовка информации о дате и времени"""
-        datetime = " " * 10 +f"# day {self.date} / time {self.time//60:02}:{self.time%60:02}"
-        if self.date % 7 in {6, 0} or not (WORK_HOURS[0] <= self.time // MIN_PER_HOUR < WORK_HOURS[1]) or \
-            (self.date % 7 == 5 and not(WORK_HOURS_FR[0] <= self.time // MIN_PER_HOUR < WORK_HOURS_FR[1])):
+    def recalc_datetime(self, date=None, time=None, state=None):
+        """Перерисовка информации о дате и времени (по умолчанию - текущие значения модели)"""
+        if date is None:
+            date, time, state = self.simulation.date, self.simulation.time, self.simulation.get_state()
+        datetime = " " * 10 +f"# day {date} / time {time//60:02}:{time%60:02}"
+        if state == 'home':
             datetime += "   ЗАКРЫТО"
-        elif BREAK_HOURS[0] <= self.time // MIN_PER_HOUR < BREAK_HOURS[1]:
+        elif state == 'break':
             datetime += "   ПЕРЕРЫВ"
         else:
             datetime += " " * 10
         self.datetime_var.set(datetime)
 
-    def draw_clerks_status(self):
-        """Отрисовка занятости клерков"""
+    def draw_clerks_status(self, statuses=None):
+        """Отрисовка занятости клерков (по clerks_per_row окон в ряд); statuses - состояния клерков из снимка фонового расчета
+           Прямоугольники создаются при первой отрисовке, дальше меняется только цвет тех, у кого сменилось состояние"""
+        if statuses is None:
+            statuses = [clerk.status for clerk in self.simulation.bank.clerks]
+        fills = ['green' if status == 'free' else 'grey' if status in {'home', 'break'} else 'red' for status in statuses]
+        if len(self.clerk_items) != len(fills):
+            self.layout_clerks(fills)
+            return
+        for item, old_fill, fill in zip(self.clerk_items, self.clerk_fills, fills):
+            if fill != old_fill:
+                self.clerk_canvas.itemconfig(item, fill=fill)
+        self.clerk_fills = fills
+
+    def layout_clerks(self, fills):
+        """Создание прямоугольников клерков на холсте"""
         width = 15
         height = 20
 
-        left_margin_base = 10 + (self.clerks_range[1] - self.n_clerks) * width 
+        n_clerks = len(fills)
+        n_columns = min(n_clerks, self.clerks_per_row)
+        left_margin_base = 10 + max(7 - n_columns, 0) * width
         indent_down = 10
 
         internal_indent = 10
 
-        for i in range(self.n_clerks):
-            x0 = left_margin_base + i * (internal_indent + width)
-            y0 = indent_down
+        n_rows = (n_clerks + n_columns - 1) // n_columns
+        self.clerk_canvas.config(width=max(200, 2 * left_margin_base + n_columns * (internal_indent + width)),
+                                 height=2 * indent_down + n_rows * (internal_indent + height))
+        self.clerk_canvas.delete('all')
+        self.clerk_items = []
+        for i in range(n_clerks):
+            x0 = left_margin_base + (i % n_columns) * (internal_indent + width)
+            y0 = indent_down + (i // n_columns) * (internal_indent + height)
             x1 = x0 + width
             y1 = y0 + height
-            if self.bank.clerks[i].status == 'free':
-                fill_color = 'green'
-            elif self.bank.clerks[i].status in {'home', 'break'}:
-                fill_color = 'grey'
-            else:
-                fill_color = 'red'
-
-            self.clerk_canvas.create_rectangle(x0, y0, x1, y1, fill=fill_color)
+            self.clerk_items.append(self.clerk_canvas.create_rectangle(x0, y0, x1, y1, fill=fills[i]))
             
             self.clerk_canvas.create_text((x0 + x1) // 2, (y0 + y1) // 2, text=str(i+1))
+        self.clerk_fills = fills
 
     def add_info_tablo(self, client_id, clerk_id):
         """Добавление информации на табло"""
-        self.table.insert(parent='', index=0, text='', open=False,
-                                        values=(client_id, clerk_id))
+        self.tablo_items[client_id] = self.table.insert(parent='', index=0, text='', open=False,
+                                                        values=(client_id, clerk_id))
         
     def remove_tablo_line(self, client_id):
-        items = self.table.get_children()
-        for item in items:
-            if self.table.item(item)["values"][0] == client_id:
-                self.table.delete(item)
-                break
-
-    def make_step(self, check_modeling_step=True):
-        """Моделирование 1 шага
-           В зависимости от рандомного значения промежутка между клиентами, создаются новые клиенты и направляются в банк в очередь обработки
-           Поминутно моделируются вызовы соответствующего метода для класса Bank"""  
-
-        if check_modeling_step:
-            self.modeling_step = {"1 мин": 1, "5 мин": 5, "30 мин": 30, "1 час": 60, "2 часа": 2 * MIN_PER_HOUR, "1 день": HOURS_PER_DAY * MIN_PER_HOUR}.get(self.step_var.get())
-        for _ in range(self.modeling_step):
-            if self.date % 7 in {6, 0} or not (WORK_HOURS[0] <= self.time // MIN_PER_HOUR < WORK_HOURS[1]) or \
-                (self.date % 7 == 5 and not(WORK_HOURS_FR[0] <= self.time // MIN_PER_HOUR < WORK_HOURS_FR[1])):
-                
-                if (0 < self.date % 7 < 5 and self.time == WORK_HOURS[1] * MIN_PER_HOUR) or (self.date % 7 == 5 and self.time == WORK_HOURS_FR[1] * MIN_PER_HOUR):
-                    self.calc_stats()  
-
-                self.lost_clients.extend(self.bank.drop_q())
-                self.time_to_client = None
-                self.inc_time()
-                processed_clients = self.bank.make_step('home')
-                self.processed_clients.extend(processed_clients)           
-                
-            elif BREAK_HOURS[0] <= self.time // MIN_PER_HOUR < BREAK_HOURS[1]:
-                self.inc_time()
-                self.time_to_client = None
-                processed_clients = self.bank.make_step('break')
-                self.processed_clients.extend(processed_clients)
-
+        item = self.tablo_items.pop(client_id, None)
+        if item is not None:
+            self.table.delete(item)
+
+    def on_serve_start(self, client_id, clerk_id):
+        self.pending_tablo[client_id] = clerk_id
+
+    def on_serve_finish(self, client_id):
+        # клиент, пришедший и ушедший между перерисовками, на табло не попадает
+        if self.pending_tablo.pop(client_id, None) is None:
+            self.pending_tablo[client_id] = None
+
+    def on_step(self):
+        self.request_refresh()
+
+    def request_refresh(self):
+        """Перерисовка один раз за кадр, сколько бы шагов модели ни прошло"""
+        if not self.refresh_scheduled:
+            self.refresh_scheduled = True
+            self.window.after_idle(self.refresh)
+
+    def refresh(self):
+        """Перерисовка окна: табло, дата, клерки и статистики"""
+        self.refresh_scheduled = False
+        if self.worker is not None:
+            return
+        for client_id, clerk_id in self.pending_tablo.items():
+            if clerk_id is None:
+                self.remove_tablo_line(client_id)
             else:
-                self.bank.start_work()
-                if self.time_to_client is None:
-                    self.time_to_client = self.randomizer.gen_period_between_clients(self.distr, self.query_range, self.calc_time_coef(), self.calc_decrease_coef())
-                while self.time_to_client == 0:
-                    profit = self.randomizer.gen_profit(self.distr, self.profit_range)
-                    lost_client = self.bank.process_new_client(Client(self.curr_client_id, self.time, profit))
-                    if lost_client:
-                        lost_client.status = 'lost'
-                        lost_client.wait_time = 0
-                        self.lost_clients.append(lost_client)
-                    self.curr_client_id += 1
-                    self.time_to_client = self.randomizer.gen_period_between_clients(self.distr, self.query_range, self.calc_time_coef(), self.calc_decrease_coef())
-                processed_clients = self.bank.make_step()
-                self.processed_clients.extend(processed_clients)
-                for client in processed_clients:
-                    self.remove_tablo_line(client.id)
-                
-                self.inc_time()
-                self.time_to_client -= 1
-                self.q_lens.append(len(self.bank.client_queue))
-                self.clerk_busy_time.append(sum([clerk.status == 'busy' for clerk in self.bank.clerks]))
-    
+                self.add_info_tablo(client_id, clerk_id)
+        self.pending_tablo = {}
         self.recalc_datetime()
-        self.draw_clerks_status() 
-        self.calc_stats()
-        self.show_statistic()    
-    
-    def inc_time(self):
-        """+ 1 минута к текущему времени"""
-        if self.time == 23 * MIN_PER_HOUR + 59:
-            self.time = 0
-            self.date += 1 
-        else:
-            self.time += 1
-        
+        self.draw_clerks_status()
+        self.show_statistic()
+
+    def make_step(self):
+        """Моделирование 1 шага выбранной длины"""
+        if self.worker is None:
+            self.simulation.make_step(STEP_OPTIONS[self.step_var.get()])
 
     def make_all_steps(self):
-        """Моделирование до конца периода"""
-        self.modeling_step = (31 - self.date) * HOURS_PER_DAY * MIN_PER_HOUR + 10 * MIN_PER_HOUR - self.time 
-        self.make_step(False)
-
-    def calc_time_coef(self):
-        """Расчет коэффициента для генерации промежутка между людьми, который задает зависимость потока от текщего дня и времени"""
-        coef = 0
-        if self.date % 5 == 0:
-            coef -= 1 / (self.query_range[1] - self.query_range[0])
-        if self.time >= 16 * MIN_PER_HOUR:
-            coef -= 2 / (self.query_range[1] - self.query_range[0])
-        return coef
-
-    def calc_decrease_coef(self):
-        """Расчет коэффициента для генерации промежутка между людьми, который задает зависимость от длины очереди и числа потерянных клиентов"""
-        return (len(self.lost_clients) / 100 + len(self.bank.client_queue) / 3) / (self.query_range[1] - self.query_range[0])
-
-    def calc_stats(self):
-        """Пересчет статистик после очередного шага моделирования"""
-        if (0 < self.date % 7 < 5 and self.time == WORK_HOURS[1] * MIN_PER_HOUR) or (self.date % 7 == 5 and self.time == WORK_HOURS_FR[1] * MIN_PER_HOUR):
-            self.bank.statistics['profit'] -= 2000 * self.n_clerks # salary
-        self.bank.statistics['max_q_len'] = max(self.q_lens)
-        self.bank.statistics['min_q_len'] = min(self.q_lens)
-        self.bank.statistics['avg_q_len'] = round(np.mean(self.q_lens), 3)
-        self.bank.statistics['curr_q_len'] = self.q_lens[-1]
-        
-        sum_waiting_time = 0 
-        client_num = len(self.processed_clients)
-        for client in self.processed_clients:
-            sum_waiting_time += client.wait_time
-
-        for client in self.lost_clients:
-            if client.wait_time:
-                sum_waiting_time += client.wait_time
-                client_num += 1
-        
-        for clerk in self.bank.clerks:
-            if clerk.client:
-                sum_waiting_time += clerk.client.wait_time
-                client_num += 1
-
-        self.bank.statistics['avg_waiting_time'] = round(sum_waiting_time / max(client_num, 1), 3)
-
-        work_time = 0
-        for d in range(1, self.date):
-            if d % 7 in {6, 0}: 
-                continue
-            elif d % 7 == 5:
-                work_time += 6 * MIN_PER_HOUR
-            else:
-                work_time += 8 * MIN_PER_HOUR
-        if self.date % 7 == 5:
-            if 10 * MIN_PER_HOUR <= self.time <= BREAK_HOURS[0] * MIN_PER_HOUR:
-                work_time += self.time - 10 * MIN_PER_HOUR
-            elif BREAK_HOURS[0] * MIN_PER_HOUR <= self.time <= WORK_HOURS_FR[1] * MIN_PER_HOUR:
-                work_time += 2 * MIN_PER_HOUR + max(self.time - BREAK_HOURS[1] * MIN_PER_HOUR, 0)
-            elif self.time > WORK_HOURS_FR[1] * MIN_PER_HOUR:
-                work_time += 6 * MIN_PER_HOUR
-        elif 0 < self.date % 7 < 5:
-            if WORK_HOURS[0] * MIN_PER_HOUR <= self.time <= BREAK_HOURS[0] * MIN_PER_HOUR:
-                work_time += self.time - 10 * MIN_PER_HOUR
-            elif BREAK_HOURS[0] * MIN_PER_HOUR <= self.time <= WORK_HOURS[1] * MIN_PER_HOUR:
-                work_time += 2 * MIN_PER_HOUR + max(self.time - BREAK_HOURS[1] * MIN_PER_HOUR, 0)
-            elif self.time > WORK_HOURS[1] * MIN_PER_HOUR:
-                work_time += 8 * MIN_PER_HOUR
-
-        self.bank.statistics['avg_clerk_busy_time'] = round(sum(self.clerk_busy_time) / (self.n_clerks * work_time), 3)
- 
-    def show_statistic(self, is_start=False):
-        """Отрисовка новых статистик"""
+        """Моделирование до конца периода в фоновом потоке; окно обновляется по снимкам с выбранной частотой"""
+        if self.simulation is None or self.worker is not None:
+            return
+        self.stop_playback()
+        refresh_ms = REFRESH_OPTIONS[self.refresh_var.get()]
+        # пока считает фоновый поток, события модели не должны попадать в интерфейс напрямую
+        self.simulation.unsubscribe(self)
+        self.pending_tablo = {}
+        self.worker = SimulationWorker(self.simulation, self.simulation.steps_to_end(), refresh_ms / 1000)
+        self.progress['value'] = 0
+        self.pause_button.config(state='normal', text="пауза")
+        self.cancel_button.config(state='normal')
+        self.worker.start()
+        self.window.after(refresh_ms, self.poll_worker)
+
+    def poll_worker(self):
+        """Отрисовка последнего снимка фонового расчета; ошибка в фоновом потоке останавливает расчет и выводится в окне"""
+        if self.worker is None:
+            return
+        snapshot = self.worker.get_latest_snapshot()
+        if snapshot is not None and 'error' in snapshot:
+            self.stop_playback()
+            self.finish_run()
+            messagebox.showerror("Ошибка моделирования", f"{type(snapshot['error']).__name__}: {snapshot['error']}")
+            return
+        if snapshot is not None:
+            self.show_snapshot(snapshot)
+        if snapshot is not None and snapshot['finished']:
+            self.finish_run()
+        else:
+            self.window.after(REFRESH_OPTIONS[self.refresh_var.get()], self.poll_worker)
+
+    def show_snapshot(self, snapshot):
+        self.recalc_datetime(snapshot['date'], snapshot['time'], snapshot['state'])
+        self.draw_clerks_status(snapshot['clerks'])
+        self.sync_tablo(snapshot['serving'])
+        self.show_statistic(statistics=snapshot['statistics'])
+        self.progress['value'] = snapshot['progress']
+
+    def finish_run(self):
+        """Окончание фонового расчета: модель снова принадлежит интерфейсу"""
+        self.worker = None
+        self.simulation.subscribe(self)
+        self.pause_button.config(state='disabled', text="пауза")
+        self.cancel_button.config(state='disabled')
+
+    def toggle_pause(self):
+        if self.worker is None:
+            return
+        if self.worker.is_paused():
+            self.worker.resume()
+            self.pause_button.config(text="пауза")
+        else:
+            self.worker.pause()
+            self.pause_button.config(text="продолжить")
+
+    def cancel_run(self):
+        """Остановка фонового расчета на достигнутой минуте"""
+        if self.worker is None:
+            return
+        self.worker.cancel()
+        self.worker.thread.join()
+        self.poll_worker()
+
+    def sync_tablo(self, serving):
+        """Приведение табло к списку обслуживаемых клиентов [(клиент, окно)] из снимка"""
+        serving = dict(serving)
+        for client_id in [client_id for client_id in self.tablo_items if client_id not in serving]:
+            self.remove_tablo_line(client_id)
+        for client_id, clerk_id in serving.items():
+            if client_id not in self.tablo_items:
+                self.add_info_tablo(client_id, clerk_id)
+
+    def toggle_playback(self):
+        """Воспроизведение модели в реальном времени с выбранной скоростью (минут модели в секунду)"""
+        if self.playback is not None:
+            self.stop_playback()
+            return
+        if self.simulation is None or self.worker is not None:
+            return
+        self.playback = (time.monotonic(), self.simulation.get_minute(), PLAYBACK_OPTIONS[self.speed_var.get()])
+        self.play_button.config(text="стоп")
+        self.window.after(1000 // PLAYBACK_FPS, self.play_frame)
+
+    def stop_playback(self):
+        if self.playback is None:
+            return
+        self.playback = None
+        self.play_button.config(text="воспроизвести")
+
+    def play_frame(self):
+        """Кадр воспроизведения: модель догоняет реальное время, перерисовка - одна на кадр"""
+        if self.playback is None:
+            return
+        start, start_minute, speed = self.playback
+        now = time.monotonic()
+        if speed != PLAYBACK_OPTIONS[self.speed_var.get()]:
+            # при смене скорости отсчет начинается заново с текущей минуты
+            start, start_minute, speed = now, self.simulation.get_minute(), PLAYBACK_OPTIONS[self.speed_var.get()]
+            self.playback = (start, start_minute, speed)
+        n_minutes = min(start_minute + int((now - start) * speed) - self.simulation.get_minute(), self.simulation.steps_to_end())
+        if n_minutes > 0:
+            modeling_step = self.simulation.modeling_step
+            self.simulation.make_step(n_minutes)
+            self.simulation.modeling_step = modeling_step
+        if self.simulation.steps_to_end() > 0:
+            self.window.after(1000 // PLAYBACK_FPS, self.play_frame)
+        else:
+            self.stop_playback()
+
+    def schedule_estimate(self, *_):
+        """Пересчет оценки после паузы во вводе: каждое изменение параметров откладывает его заново"""
+        if self.estimate_job is not None:
+            self.window.after_cancel(self.estimate_job)
+        self.estimate_job = self.window.after(ESTIMATE_DELAY_MS, self.show_estimate)
+
+    def show_estimate(self):
+        """Пересчет аналитической оценки при изменении параметров (в фоновом потоке: для нормального распределения
+           расчет занимает доли секунды)"""
+        self.estimate_job = None
+        try:
+            params = (self.clerks_var.get(),
+                      self.max_q_len_var.get(),
+                      self.distribution_var.get(),
+                      (int(self.time_from_entry.get()), int(self.time_to_entry.get())),
+                      (int(self.profit_from_entry.get()), int(self.profit_to_entry.get())),
+                      self.serv_duration_range)
+        except (ValueError, tk.TclError):
+            self.estimate_future = None
+            self.estimate_var.set("неверные параметры")
+            return
+        self.estimate_future = self.estimate_executor.submit(estimate, *params)
+        self.window.after(ESTIMATE_POLL_MS, self.poll_estimate, self.estimate_future)
+
+    def poll_estimate(self, future):
+        """Вывод готовой оценки; результаты устаревших запросов не показываются"""
+        if future is not self.estimate_future:
+            return
+        if not future.done():
+            self.window.after(ESTIMATE_POLL_MS, self.poll_estimate, future)
+            return
+        try:
+            values = future.result()
+        except (ValueError, ZeroDivisionError):
+            self.estimate_var.set("неверные параметры")
+            return
+        self.estimate_var.set(f"прибыль: {values['profit']}\n"
+                              f"обслуженных клиентов: {values['served_clients']}\n"
+                              f"потерянных клиентов: {values['lost_clients']}\n"
+                              f"среднее время ожидания: {values['avg_waiting_time']}\n"
+                              f"средняя занятость клерков: {values['avg_clerk_busy_time']}")
+
+    def show_statistic(self, is_start=False, statistics=None):
+        """Отрисовка новых статистик (statistics - из снимка фонового расчета, по умолчанию - текущие статистики модели)"""
         name_mapper = {'served_clients': 'обслуженных клиентов',
                        'lost_clients': 'потерянных клиентов',
+                       'reneged_clients': 'ушедших из очереди',
                        'curr_q_len': 'текущая длина очереди', 
                        'max_q_len': 'максимальная длина очереди', 
                        'min_q_len': 'минимальная длина очереди',
@@ -471,14 +538,15 @@ class System():
                        'avg_waiting_time': 'среднее время ожидания',
                        'avg_clerk_busy_time': 'средняя занятость клерков',
                        'profit':'прибыль'}
-        self.bank.statistics['profit'] = round(self.bank.statistics['profit'])
+        if statistics is None:
+            statistics = self.simulation.get_statistics()
         if is_start:
-            for i, (stat, val) in enumerate(self.bank.statistics.items()):
+            for i, (stat, val) in enumerate(statistics.items()):
                 self.stats.insert(parent='', index=i, text='', open=False,
                                             values=(name_mapper[stat], val))
         else:
             items = self.stats.get_children()
-            for item, (stat, new_val) in zip(items, self.bank.statistics.items()):
+            for item, (stat, new_val) in zip(items, statistics.items()):
                 self.stats.item(item, values=(name_mapper[stat], new_val))
 
 if __name__ == '__main__':
@@ -0,0 +1,140 @@
+from array import array
+from collections import OrderedDict
+
+from business_calendar import MIN_PER_DAY, MIN_PER_HOUR
+from streaming_stats import RunningStat
+
+# ряды: длина очереди и доля занятых клерков в рабочую минуту
+SERIES = ('q_len', 'utilization')
+# разрешения сводок: длина интервала в минутах
+RESOLUTIONS = {'hour': MIN_PER_HOUR, 'day': MIN_PER_DAY}
+# сколько последних поминутных значений хранится (неделя) и сколько интервалов каждой сводки (год)
+SAMPLES_CAPACITY = 7 * MIN_PER_DAY
+MAX_BUCKETS = {'hour': 366 * 24, 'day': 366}
+
+
+class RingBuffer():
+    """Последние capacity значений в типизированном массиве фиксированного размера (старые перезаписываются)"""
+    def __init__(self, capacity, typecode='d'):
+        self.values = array(typecode, [0]) * capacity
+        self.capacity = capacity
+        self.count = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, value):
+        self.values[self.count % self.capacity] = value
+        self.count += 1
+
+    def to_list(self):
+        """Хранящиеся значения от старых к новым"""
+        if self.count <= self.capacity:
+            return self.values[:self.count].tolist()
+        pos = self.count % self.capacity
+        return self.values[pos:].tolist() + self.values[:pos].tolist()
+
+
+class Rollup():
+    """Сводка рядов по интервалам длиной length минут: RunningStat (минимум, максимум, среднее, сумма) на интервал и ряд
+       Хранятся последние max_buckets интервалов по возрастанию номера, поэтому самый старый вытесняется за O(1)"""
+    def __init__(self, length, max_buckets):
+        self.length = length
+        self.max_buckets = max_buckets
+        self.buckets = OrderedDict()
+
+    def add(self, minute, values, n_minutes=1):
+        """Учет n_minutes минут подряд с минуты minute с одинаковыми значениями рядов (могут попасть в несколько интервалов)"""
+        end = minute + n_minutes
+        while minute < end:
+            bucket = minute // self.length
+            weight = min(end, (bucket + 1) * self.length) - minute
+            for stat, value in zip(self.get_bucket(bucket), values):
+                stat.add(value, weight)
+            minute += weight
+
+    def get_bucket(self, bucket):
+        """Счетчики интервала bucket; если окно заполнено, а интервал старше всех хранящихся, - пустой список (значения отбрасываются)"""
+        stats = self.buckets.get(bucket)
+        if stats is not None:
+            return stats
+        if len(self.buckets) >= self.max_buckets and bucket < next(iter(self.buckets)):
+            return []
+        newer = [key for key in reversed(self.buckets) if key > bucket] if self.buckets and bucket < next(reversed(self.buckets)) else []
+        stats = self.buckets[bucket] = [RunningStat() for _ in SERIES]
+        # интервал из середины (только при объединении сводок): более новые переносятся в конец, чтобы сохранить порядок
+        for key in reversed(newer):
+            self.buckets.move_to_end(key)
+        if len(self.buckets) > self.max_buckets:
+            self.buckets.popitem(last=False)
+        return stats
+
+    def merge(self, other):
+        """Объединение со сводкой другого прогона (интервалы с одинаковым номером складываются)"""
+        for bucket, other_stats in other.buckets.items():
+            for stat, other_stat in zip(self.get_bucket(bucket), other_stats):
+                stat.merge(other_stat)
+
+
+class TimeSeries():
+    """Ряды длины очереди и занятости клерков по рабочим минутам
+       Поминутные значения хранятся в кольцевых буферах (последние capacity минут), сводки по часам и дням
+       обновляются при каждом добавлении, поэтому память ограничена, а запросы по периодам не перебирают минуты"""
+
+    def __init__(self, capacity=SAMPLES_CAPACITY, max_buckets=None):
+        max_buckets = dict(MAX_BUCKETS, **(max_buckets or {}))
+        self.minutes = RingBuffer(capacity, 'q')
+        self.samples = {name: RingBuffer(capacity) for name in SERIES}
+        self.rollups = {resolution: Rollup(length, max_buckets[resolution]) for resolution, length in RESOLUTIONS.items()}
+
+    def add(self, minute, q_len, utilization, n_minutes=1):
+        """Учет n_minutes рабочих минут с минуты minute (от начала первого дня) с одинаковыми значениями"""
+        for offset in range(max(n_minutes - self.minutes.capacity, 0), n_minutes):
+            self.minutes.append(minute + offset)
+            self.samples['q_len'].append(q_len)
+            self.samples['utilization'].append(utilization)
+        for rollup in self.rollups.values():
+            rollup.add(minute, (q_len, utilization), n_minutes)
+
+    def get_samples(self, series):
+        """Последние поминутные значения ряда: список (минута, значение)"""
+        return list(zip(self.minutes.to_list(), self.samples[series].to_list()))
+
+    def query(self, series, resolution='hour', first_day=None, last_day=None, stat='mean'):
+        """Значения ряда по интервалам сводки resolution за дни first_day..last_day (нумерация дней с 1, как Simulation.date)
+           stat - 'mean', 'min', 'max', 'sum' или 'count' (число рабочих минут); возвращает список (минута начала интервала, значение)"""
+        rollup = self.rollups[resolution]
+        idx = SERIES.index(series)
+        start = 0 if first_day is None else (first_day - 1) * MIN_PER_DAY
+        end = None if last_day is None else last_day * MIN_PER_DAY
+        result = []
+        for bucket in rollup.buckets:
+            minute = bucket * rollup.length
+            if minute < start or (end is not None and minute >= end):
+                continue
+            result.append((minute, get_value(rollup.buckets[bucket][idx], stat)))
+        return result
+
+    def get_report(self, resolution='day', first_day=None, last_day=None):
+        """Сводка для отчетов и графиков: по каждому ряду список интервалов с минимумом, максимумом, средним и суммой"""
+        report = {}
+        for series in SERIES:
+            rows = {name: self.query(series, resolution, first_day, last_day, name) for name in ('min', 'max', 'mean', 'sum')}
+            report[series] = [{'start': minute, 'min': low, 'max': high, 'mean': round(mean, 4), 'sum': total}
+                              for (minute, low), (_, high), (_, mean), (_, total) in zip(rows['min'], rows['max'], rows['mean'], rows['sum'])]
+        return report
+
+    def merge(self, other):
+        """Объединение сводок с рядами другого прогона (поминутные значения не объединяются)"""
+        for resolution, rollup in self.rollups.items():
+            rollup.merge(other.rollups[resolution])
+
+
+def get_value(stat, name):
+    if name == 'mean':
+        return stat.get_avg()
+    elif name == 'sum':
+        return stat.total
+    elif name == 'count':
+        return stat.count
+    return getattr(stat, name)
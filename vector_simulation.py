@@ -0,0 +1,191 @@
+import argparse
+import json
+import math
+
+import numpy as np
+
+from clerk import Clerk
+from randomizer import Randomizer
+from replication import ReplicationRunner
+from business_calendar import BusinessCalendar
+from simulation import MIN_PER_DAY, MODELING_START, MODELING_END, TIME_FACTORS, add_model_args, calc_time_coef, get_model_params
+
+
+class VectorSimulation():
+    """Векторный движок: K независимых прогонов модели одновременно в виде массивов numpy
+       Остаток времени обслуживания клерков хранится в массиве K x n_clerks, очереди - в кольцевом буфере K x max_q_len
+       с временами прихода, счетчики статистик - в векторах длины K. Каждая минута обрабатывается для всех прогонов сразу
+       по тем же правилам календаря и прихода клиентов, что и в объектной модели.
+       Прибыль клиента разыгрывается при окончании обслуживания (а не при приходе) - распределение статистик от этого не меняется.
+       Клерки одинаковы, поэтому политика назначения (assignment) на статистики не влияет и принимается только для совместимости параметров"""
+
+    def __init__(self, n_replications, n_clerks, max_q_len, distr, query_range, profit_range, serv_duration_range=(2, 30), seed=None, calendar=None, assignment='in_order',
+                 time_factors=None):
+        self.n_replications = n_replications
+        self.n_clerks = n_clerks
+        self.max_queue_len = max_q_len
+        self.distr = distr
+        self.query_range = tuple(query_range)
+        self.profit_range = tuple(profit_range)
+        self.serv_duration_range = tuple(serv_duration_range)
+        self.salary = Clerk(0).salary
+        self.randomizer = Randomizer(seed)
+        self.calendar = BusinessCalendar() if calendar is None else calendar
+        self.time_factors = TIME_FACTORS if time_factors is None else dict(time_factors)
+
+        self.minute = MODELING_START
+        self.remaining = np.zeros((n_replications, n_clerks), dtype=np.int64)
+        self.queue = np.zeros((n_replications, max(max_q_len, 1)), dtype=np.int64)
+        self.q_head = np.zeros(n_replications, dtype=np.int64)
+        self.q_len = np.zeros(n_replications, dtype=np.int64)
+        self.time_to_client = np.full(n_replications, -1, dtype=np.int64)
+
+        self.profit = np.zeros(n_replications)
+        self.served_clients = np.zeros(n_replications, dtype=np.int64)
+        self.lost_clients = np.zeros(n_replications, dtype=np.int64)
+        self.waiting_time_sum = np.zeros(n_replications, dtype=np.int64)
+        self.waiting_clients = np.zeros(n_replications, dtype=np.int64)
+        self.q_len_sum = np.zeros(n_replications, dtype=np.int64)
+        self.q_len_min = np.full(n_replications, np.iinfo(np.int64).max)
+        self.q_len_max = np.zeros(n_replications, dtype=np.int64)
+        self.q_len_last = np.zeros(n_replications, dtype=np.int64)
+        self.busy_sum = np.zeros(n_replications, dtype=np.int64)
+        self.work_minutes = 0
+
+    def gen_periods(self, idx, time_coef):
+        """Промежутки до следующего клиента для прогонов idx"""
+        width = self.query_range[1] - self.query_range[0]
+        decrease_coef = (self.lost_clients[idx] / 100 + self.q_len[idx] / 3) / width
+        values = self.randomizer.distr_values(self.distr, self.query_range, len(idx), 'arrival')
+        periods = np.rint((1 + time_coef + decrease_coef) * values)
+        return np.clip(periods, self.query_range[0], self.query_range[1]).astype(np.int64)
+
+    def process_arrivals(self, date, time):
+        """Приход клиентов в текущую минуту (в одном прогоне их может быть несколько)"""
+        time_coef = calc_time_coef(date, time, self.query_range, self.time_factors)
+        idx = np.flatnonzero(self.time_to_client < 0)
+        if len(idx):
+            self.time_to_client[idx] = self.gen_periods(idx, time_coef)
+        idx = np.flatnonzero(self.time_to_client == 0)
+        while len(idx):
+            full = self.q_len[idx] >= self.max_queue_len
+            self.lost_clients[idx[full]] += 1
+            accepted = idx[~full]
+            self.queue[accepted, (self.q_head[accepted] + self.q_len[accepted]) % self.queue.shape[1]] = self.minute
+            self.q_len[accepted] += 1
+            self.time_to_client[idx] = self.gen_periods(idx, time_coef)
+            idx = idx[self.time_to_client[idx] == 0]
+
+    def process_clerks(self, assign):
+        """Минута работы клерков: окончание обслуживания и (в рабочее время) прием клиентов из очереди по порядку окон"""
+        busy = self.remaining > 0
+        self.remaining[busy] -= 1
+        finished = np.flatnonzero((busy & (self.remaining == 0)).ravel()) // self.n_clerks
+        if len(finished):
+            profits = self.randomizer.distr_values(self.distr, self.profit_range, len(finished), 'profit')
+            self.profit += np.bincount(finished, weights=profits, minlength=self.n_replications)
+            self.served_clients += np.bincount(finished, minlength=self.n_replications)
+        if not assign:
+            return
+        for clerk in range(self.n_clerks):
+            idx = np.flatnonzero((self.remaining[:, clerk] == 0) & (self.q_len > 0))
+            if not len(idx):
+                continue
+            self.waiting_time_sum[idx] += self.minute - self.queue[idx, self.q_head[idx]]
+            self.waiting_clients[idx] += 1
+            self.q_head[idx] = (self.q_head[idx] + 1) % self.queue.shape[1]
+            self.q_len[idx] -= 1
+            durations = self.randomizer.distr_values(self.distr, self.serv_duration_range, len(idx), 'service')
+            self.remaining[idx, clerk] = np.rint(durations).astype(np.int64)
+
+    def drop_q(self):
+        """Закрытие: все ожидающие клиенты уходят"""
+        idx = np.flatnonzero(self.q_len)
+        for pos in range(self.queue.shape[1]):
+            waiting = idx[self.q_len[idx] > pos]
+            waits = self.minute - self.queue[waiting, (self.q_head[waiting] + pos) % self.queue.shape[1]]
+            self.waiting_time_sum[waiting] += waits
+            self.waiting_clients[waiting] += waits > 0
+        self.lost_clients += self.q_len
+        self.q_len[:] = 0
+        self.q_head[:] = 0
+
+    def make_step(self):
+        """Одна минута для всех прогонов; возвращает следующую минуту для обработки"""
+        date, time = self.minute // MIN_PER_DAY + 1, self.minute % MIN_PER_DAY
+        state = self.calendar.get_state(self.minute)
+        if state == 'work':
+            self.process_arrivals(date, time)
+            self.process_clerks(True)
+            self.time_to_client -= 1
+            self.q_len_sum += self.q_len
+            np.minimum(self.q_len_min, self.q_len, out=self.q_len_min)
+            np.maximum(self.q_len_max, self.q_len, out=self.q_len_max)
+            self.q_len_last[:] = self.q_len
+            self.busy_sum += (self.remaining > 0).sum(axis=1)
+            self.work_minutes += 1
+            return self.minute + 1
+
+        if state == 'home':
+            if self.calendar.is_closing_time(self.minute):
+                self.profit -= self.salary * self.n_clerks
+            self.drop_q()
+        self.time_to_client[:] = -1
+        self.process_clerks(False)
+        # когда все клерки свободны, в закрытое время и в перерыв ничего не происходит
+        return self.minute + 1 if self.remaining.any() else self.calendar.next_state_change(self.minute)
+
+    def run(self, end=MODELING_END):
+        """Моделирование до минуты end, возвращает словарь статистик (массивы длины K)"""
+        while self.minute < end:
+            self.minute = min(self.make_step(), end)
+        return self.get_statistics()
+
+    def get_statistics(self):
+        """Статистики в том же виде, что и bank.statistics, но для каждого прогона"""
+        work_minutes = max(self.work_minutes, 1)
+        return {'profit': np.rint(self.profit),
+                'served_clients': self.served_clients.copy(),
+                'lost_clients': self.lost_clients.copy(),
+                'avg_waiting_time': np.round(self.waiting_time_sum / np.maximum(self.waiting_clients, 1), 3),
+                'avg_clerk_busy_time': np.round(self.busy_sum / (self.n_clerks * work_minutes), 3),
+                'curr_q_len': self.q_len_last.copy(),
+                'max_q_len': self.q_len_max.copy(),
+                'min_q_len': np.where(self.work_minutes, self.q_len_min, 0),
+                'avg_q_len': np.round(self.q_len_sum / work_minutes, 3)}
+
+
+def check_against_object_engine(params, n_replications=200, seed=0, engine='event', workers=None):
+    """Статистическая проверка векторного движка: сравнение средних с объектной моделью (z-статистика разности)"""
+    vector_stats = VectorSimulation(n_replications, **params, seed=seed).run()
+    object_stats = ReplicationRunner(params, engine, workers, seed).run(n_replications)
+    report = {}
+    for name, values in vector_stats.items():
+        object_summary = object_stats[name]
+        std_error = math.sqrt(values.var(ddof=1) / len(values) + object_summary['std'] ** 2 / object_summary['n'])
+        z_score = (values.mean() - object_summary['mean']) / std_error if std_error > 0 else 0.0
+        report[name] = {'vector_mean': float(values.mean()), 'object_mean': object_summary['mean'], 'z_score': z_score}
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Векторный движок: много прогонов модели одновременно")
+    add_model_args(parser)
+    parser.add_argument('--replications', type=int, default=1000, help="число одновременных прогонов")
+    parser.add_argument('--check', action='store_true', help="сравнить со средними объектной модели")
+    args = parser.parse_args(argv)
+    if args.client_classes is not None or args.patience_range is not None:
+        parser.error("the vector engine does not model client classes or patience (--client-classes, --patience-range)")
+
+    params = get_model_params(args)
+    if args.check:
+        result = check_against_object_engine(params, args.replications, args.seed if args.seed is not None else 0, args.engine)
+    else:
+        statistics = VectorSimulation(args.replications, **params, seed=args.seed).run()
+        result = {name: {'mean': float(values.mean()), 'std': float(values.std(ddof=1)) if len(values) > 1 else 0.0}
+                  for name, values in statistics.items()}
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
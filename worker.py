@@ -0,0 +1,86 @@
+import queue
+import threading
+import time
+
+
+class SimulationWorker():
+    """Моделирование в фоновом потоке, чтобы окно интерфейса не зависало
+       Поток считает модель порциями по chunk минут и не чаще раза в refresh_interval секунд кладет в очередь snapshots
+       снимок состояния; интерфейс забирает снимки из очереди сам (window.after), поэтому перерисовка не тормозит модель.
+       Пока поток работает, модель принадлежит ему: интерфейс читает только снимки"""
+
+    def __init__(self, simulation, n_minutes, refresh_interval=0.1, chunk=60):
+        self.simulation = simulation
+        self.n_minutes = n_minutes
+        self.refresh_interval = refresh_interval
+        self.chunk = chunk
+        self.start_minute = simulation.get_minute()
+        self.snapshots = queue.Queue()
+        self.running = threading.Event()
+        self.running.set()
+        self.cancelled = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def pause(self):
+        self.running.clear()
+
+    def resume(self):
+        self.running.set()
+
+    def cancel(self):
+        """Остановка после текущей порции; модель остается в согласованном состоянии на достигнутой минуте"""
+        self.cancelled.set()
+        self.running.set()
+
+    def is_paused(self):
+        return not self.running.is_set()
+
+    def is_alive(self):
+        return self.thread.is_alive()
+
+    def run(self):
+        modeling_step = self.simulation.modeling_step
+        end = self.start_minute + self.n_minutes
+        last_snapshot = time.monotonic()
+        try:
+            while self.simulation.get_minute() < end and not self.cancelled.is_set():
+                self.running.wait()
+                if self.cancelled.is_set():
+                    break
+                self.simulation.make_step(min(self.chunk, end - self.simulation.get_minute()))
+                if time.monotonic() - last_snapshot >= self.refresh_interval:
+                    self.snapshots.put(self.make_snapshot())
+                    last_snapshot = time.monotonic()
+        except Exception as error:
+            self.snapshots.put({'error': error, 'finished': True})
+            raise
+        finally:
+            self.simulation.modeling_step = modeling_step
+        self.snapshots.put(self.make_snapshot(finished=True))
+
+    def make_snapshot(self, finished=False):
+        """Снимок для отрисовки: время, режим, состояния клерков, обслуживаемые клиенты, статистики и доля выполненного"""
+        simulation = self.simulation
+        return {'date': simulation.date,
+                'time': simulation.time,
+                'state': simulation.get_state(),
+                'clerks': [clerk.status for clerk in simulation.bank.clerks],
+                'serving': [(clerk.client.id, clerk.id + 1) for clerk in simulation.bank.clerks if clerk.client is not None],
+                'statistics': simulation.get_statistics(),
+                'progress': (simulation.get_minute() - self.start_minute) / max(self.n_minutes, 1),
+                'finished': finished,
+                'cancelled': self.cancelled.is_set()}
+
+    def get_latest_snapshot(self):
+        """Последний из накопившихся снимков (None, если новых нет); промежуточные снимки пропускаются"""
+        snapshot = None
+        while True:
+            try:
+                snapshot = self.snapshots.get_nowait()
+            except queue.Empty:
+                return snapshot
+            if snapshot.get('finished'):
+                return snapshot